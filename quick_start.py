@@ -84,10 +84,8 @@ def quick_demo():
         start_time=1000
     )
     
-    # Exportar
-    output_file = os.path.join(OUTPUT_DIR, 'demo_song.mp3')
-    track_with_melody.normalize().export(output_file, format='mp3', bitrate='320k')
-    print(f"\n✅ Faixa exportada: {output_file}")
+    # Exportar (masterização por loudness em uma única passada)
+    composer.export_track(track_with_melody, 'demo_song', format='mp3')
     
     # Resultado
     print("\n" + "=" * 70)
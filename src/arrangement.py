@@ -0,0 +1,273 @@
+"""
+Arrangement Timeline - Linha do tempo da estrutura da música
+Mapeia tempo -> seção/compasso e renderiza qualquer trecho [início, fim)
+sem precisar renderizar a música inteira
+"""
+
+import bisect
+import numpy as np
+from pydub.effects import normalize, compress_dynamic_range
+from pydub.utils import db_to_float
+from audio_buffer import as_array, empty_buffer, from_array
+from beat_generator import BeatGenerator, DRUM_PATTERNS
+
+
+# Estrutura padrão (nome da seção, duração em segundos)
+DEFAULT_SECTIONS = [
+    ('intro', 8),
+    ('verse1', 16),
+    ('chorus', 16),
+    ('verse2', 16),
+    ('chorus2', 16),
+    ('outro', 8),
+]
+
+INTRO_FADE_MS = 2000
+OUTRO_FADE_MS = 3000
+CHORUS_GAIN_DB = 2
+NORMALIZE_HEADROOM_DB = 0.1
+
+
+def segment_to_array(segment, frame_rate):
+    """Converte um AudioSegment em array int16 mono na taxa pedida"""
+    segment = segment.set_channels(1).set_sample_width(2).set_frame_rate(frame_rate)
+    return as_array(segment)
+
+
+class Section:
+    """Uma seção da música posicionada na linha do tempo"""
+
+    def __init__(self, name, start_ms, duration_ms):
+        self.name = name
+        self.start_ms = start_ms
+        self.duration_ms = duration_ms
+
+    @property
+    def end_ms(self):
+        return self.start_ms + self.duration_ms
+
+    def __repr__(self):
+        return f"Section({self.name!r}, start_ms={self.start_ms}, duration_ms={self.duration_ms})"
+
+
+class ArrangementTimeline:
+    def __init__(self, samples, tempo=120, style='pop', sections=None, bass=None, master=True):
+        """
+        Linha do tempo de uma música estruturada
+
+        Args:
+            samples: Dict com AudioSegments 'kick', 'snare' e 'hihat'
+            tempo: BPM
+            style: 'funk' ou 'pop'
+            sections: Lista de (nome, duração em segundos)
+            bass: Função duração_ms -> AudioSegment com a linha de baixo de
+                uma seção (ex.: MusicComposer.render_bass); None = só bateria
+            master: Normalizar e comprimir cada seção, como build_audio_track
+        """
+        self.tempo = tempo
+        self.style = style
+        self.frame_rate = samples['kick'].frame_rate
+        self.beat_duration = 60000 / tempo  # ms por beat
+        self.bar_duration = self.beat_duration * 4
+
+        self.sections = []
+        position = 0
+        for name, seconds in (sections or DEFAULT_SECTIONS):
+            self.sections.append(Section(name, position, int(seconds * 1000)))
+            position += int(seconds * 1000)
+        self._section_starts = [s.start_ms for s in self.sections]
+
+        # Samples pré-convertidos (o hi-hat tem uma versão por velocity)
+        kick = segment_to_array(samples['kick'], self.frame_rate)
+        snare = segment_to_array(samples['snare'], self.frame_rate)
+        hihat = samples['hihat']
+        self._sounds = {
+            'kick': kick,
+            'snare': snare,
+            'hihat_strong': segment_to_array(hihat - (20 * (1 - 0.8)), self.frame_rate),
+            'hihat_weak': segment_to_array(hihat - (20 * (1 - 0.5)), self.frame_rate),
+        }
+        self._max_sound_frames = max(len(s) for s in self._sounds.values())
+
+        # Caches por duração de seção (seções iguais compartilham análise)
+        self._bass = bass
+        self._master = master
+        self._hits_cache = {}
+        self._bass_cache = {}
+        self._master_cache = {}
+
+    @property
+    def duration_ms(self):
+        return self.sections[-1].end_ms if self.sections else 0
+
+    def _frames(self, ms):
+        """Converte ms em número de frames (mesma regra do pydub)"""
+        return int(ms * self.frame_rate / 1000)
+
+    def section_at(self, time_ms):
+        """Retorna a seção que contém o instante dado"""
+        if time_ms < 0 or time_ms >= self.duration_ms:
+            raise ValueError(f"Tempo fora da música: {time_ms}ms")
+        index = bisect.bisect_right(self._section_starts, time_ms) - 1
+        return self.sections[index]
+
+    def locate(self, time_ms):
+        """
+        Mapeia um instante para seção, compasso e beat
+
+        Returns:
+            Dict com 'section', 'bar' (na seção), 'song_bar' e 'beat'
+        """
+        section = self.section_at(time_ms)
+        offset = time_ms - section.start_ms
+        bars_before = sum(
+            int(np.ceil(s.duration_ms / self.bar_duration))
+            for s in self.sections if s.start_ms < section.start_ms
+        )
+        bar = int(offset // self.bar_duration)
+        return {
+            'section': section.name,
+            'bar': bar,
+            'song_bar': bars_before + bar,
+            'beat': (offset % self.bar_duration) / self.beat_duration,
+        }
+
+    def kick_times(self):
+        """Instantes (ms) de todos os kicks da música, seção por seção"""
+        times = []
+        for section in self.sections:
+            times.extend(
+                section.start_ms + position
+                for position in BeatGenerator.kick_times(self.style, self.tempo, section.duration_ms)
+            )
+        return times
+
+    def _section_hits(self, duration_ms):
+        """Hits de bateria de uma seção, ordenados: (frames, sons), mesmo padrão de build_audio_track"""
+        if duration_ms in self._hits_cache:
+            return self._hits_cache[duration_ms]
+
+        pattern = DRUM_PATTERNS.get(self.style, DRUM_PATTERNS['pop'])
+        hits = []
+        bars = int(duration_ms / self.bar_duration) + 1
+        for bar in range(bars):
+            bar_start = bar * self.bar_duration
+            for name in ('kick', 'snare', 'hihat'):
+                for beat in pattern[name]:
+                    position = int(bar_start + beat * self.beat_duration)
+                    if position >= duration_ms:
+                        continue
+                    if name == 'hihat':
+                        name_key = 'hihat_strong' if int(beat * 4) % 2 == 0 else 'hihat_weak'
+                    else:
+                        name_key = name
+                    hits.append((self._frames(position), name_key))
+
+        hits.sort(key=lambda hit: hit[0])
+        result = ([frame for frame, _ in hits], [sound for _, sound in hits])
+        self._hits_cache[duration_ms] = result
+        return result
+
+    def _section_bass(self, duration_ms):
+        """Linha de baixo de uma seção (renderizada uma vez por duração)"""
+        if duration_ms not in self._bass_cache:
+            self._bass_cache[duration_ms] = segment_to_array(self._bass(duration_ms), self.frame_rate)
+        return self._bass_cache[duration_ms]
+
+    def _mix_dry(self, duration_ms, start, end):
+        """Mixa os hits (e o baixo) de uma seção no trecho [start, end) em frames"""
+        section_frames = self._frames(duration_ms)
+        end = min(end, section_frames)
+        buffer = np.zeros(max(0, end - start), dtype=np.int32)
+        if end <= start:
+            return buffer
+
+        frames, sounds = self._section_hits(duration_ms)
+        # Hits que começam antes do trecho mas cuja cauda ainda soa nele
+        first = bisect.bisect_left(frames, start - self._max_sound_frames)
+        last = bisect.bisect_left(frames, end)
+        for frame, name in zip(frames[first:last], sounds[first:last]):
+            sound = self._sounds[name]
+            hit_start = max(frame, start)
+            hit_end = min(frame + len(sound), end)
+            if hit_end <= hit_start:
+                continue
+            buffer[hit_start - start:hit_end - start] += sound[hit_start - frame:hit_end - frame]
+
+        if self._bass is not None:
+            bass = self._section_bass(duration_ms)[start:end]
+            buffer[:len(bass)] += bass
+
+        return np.clip(buffer, -32768, 32767)
+
+    def _mastered(self, duration_ms):
+        """
+        Seção normalizada e comprimida (renderizada uma vez por duração)
+
+        O compressor depende de toda a história da seção, então a seção
+        inteira é processada uma vez e os trechos saem deste cache.
+        """
+        if duration_ms not in self._master_cache:
+            dry = self._mix_dry(duration_ms, 0, self._frames(duration_ms))
+            section = from_array(dry.astype(np.int16), self.frame_rate)
+            section = compress_dynamic_range(normalize(section, headroom=NORMALIZE_HEADROOM_DB))
+            self._master_cache[duration_ms] = as_array(section)
+        return self._master_cache[duration_ms]
+
+    def _section_audio(self, duration_ms, start, end):
+        """Áudio da seção (antes dos fades) no trecho [start, end) em frames"""
+        if self._master:
+            return self._mastered(duration_ms)[start:end]
+        return self._mix_dry(duration_ms, start, end)
+
+    def _section_envelope(self, section, start, end):
+        """Envelope de ganho (fades e chorus) da seção no trecho [start, end)"""
+        frames = np.arange(start, end)
+        envelope = np.ones(len(frames))
+
+        if 'intro' in section.name:
+            ms = frames * 1000 // self.frame_rate
+            fade = db_to_float(-120) + (1 - db_to_float(-120)) * ms / INTRO_FADE_MS
+            envelope *= np.where(ms < INTRO_FADE_MS, fade, 1.0)
+        elif 'outro' in section.name:
+            ms_left = section.duration_ms - frames * 1000 // self.frame_rate
+            fade = db_to_float(-120) + (1 - db_to_float(-120)) * ms_left / OUTRO_FADE_MS
+            envelope *= np.where(ms_left <= OUTRO_FADE_MS, fade, 1.0)
+        elif 'chorus' in section.name:
+            envelope *= db_to_float(CHORUS_GAIN_DB)
+
+        return envelope
+
+    def render_range(self, start_ms, end_ms):
+        """
+        Renderiza apenas o trecho [start_ms, end_ms) da música
+
+        O custo depende do tamanho do trecho, não da música (com master,
+        cada duração de seção é masterizada uma vez e depois só fatiada).
+        O resultado é idêntico, amostra por amostra, ao mesmo trecho de
+        render().
+        """
+        start_ms = max(0, start_ms)
+        end_ms = min(end_ms, self.duration_ms)
+        start = self._frames(start_ms)
+        end = max(start, self._frames(end_ms))
+        output = empty_buffer(end - start)
+
+        for section in self.sections:
+            section_start = self._frames(section.start_ms)
+            section_end = section_start + self._frames(section.duration_ms)
+            if section_end <= start or section_start >= end:
+                continue
+
+            local_start = max(start, section_start) - section_start
+            local_end = min(end, section_end) - section_start
+            audio = self._section_audio(section.duration_ms, local_start, local_end)
+            wet = audio * self._section_envelope(section, local_start, local_end)
+            offset = section_start + local_start - start
+            np.clip(wet, -32768, 32767, out=output[offset:offset + len(wet)], casting='unsafe')
+
+        return from_array(output, self.frame_rate)
+
+    def render(self):
+        """Renderiza a música inteira"""
+        return self.render_range(0, self.duration_ms)
@@ -0,0 +1,100 @@
+"""
+Audio Buffer - Adaptador AudioSegment <-> NumPy
+Vê os dados de um AudioSegment como array NumPy sem copiar e embrulha
+arrays NumPy como AudioSegment com uma única cópia (bytes imutável)
+"""
+
+import numpy as np
+from pydub import AudioSegment
+
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _dtype(sample_width):
+    if sample_width not in SAMPLE_DTYPES:
+        raise ValueError(f"Largura de amostra não suportada: {sample_width}")
+    return SAMPLE_DTYPES[sample_width]
+
+
+def as_array(segment):
+    """
+    Vê as amostras de um AudioSegment como array (sem copiar)
+
+    Returns:
+        Array somente leitura, (frames,) se mono ou (frames, canais)
+    """
+    samples = np.frombuffer(segment.raw_data, dtype=_dtype(segment.sample_width))
+    samples.flags.writeable = False
+    if segment.channels > 1:
+        return samples.reshape(-1, segment.channels)
+    return samples
+
+
+def as_float(segment):
+    """Amostras em float64 no intervalo [-1, 1] (uma conversão)"""
+    return as_array(segment) / float(segment.max_possible_amplitude)
+
+
+def empty_buffer(frames, channels=1, sample_width=2):
+    """
+    Aloca um buffer de amostras zerado para o código de DSP escrever no lugar
+
+    Depois é entregue a from_array(), que faz a única cópia para o
+    AudioSegment.
+    """
+    shape = (frames, channels) if channels > 1 else (frames,)
+    return np.zeros(shape, dtype=_dtype(sample_width))
+
+
+def from_array(samples, frame_rate, channels=None):
+    """
+    Embrulha um array de amostras inteiras como AudioSegment
+
+    Os dados viram um bytes imutável (uma cópia): o AudioSegment continua
+    hashable, picklable e não muda se o array for alterado depois.
+
+    Args:
+        samples: Array int8/int16/int32, (frames,) ou (frames, canais)
+        frame_rate: Taxa de amostragem
+        channels: Número de canais (padrão: deduzido do shape)
+    """
+    samples = np.asarray(samples)
+    if channels is None:
+        channels = 1 if samples.ndim == 1 else samples.shape[1]
+
+    widths = {np.dtype(dtype): width for width, dtype in SAMPLE_DTYPES.items()}
+    if samples.dtype not in widths:
+        raise ValueError(f"Tipo de amostra não suportado: {samples.dtype} (use from_float)")
+
+    return AudioSegment(
+        samples.tobytes(),
+        frame_rate=frame_rate,
+        sample_width=widths[samples.dtype],
+        channels=channels
+    )
+
+
+def from_float(samples, frame_rate, sample_width=2, scale=None):
+    """
+    Converte amostras float para AudioSegment
+
+    Escala, clip e cast são escritos direto em um único buffer inteiro,
+    sem arrays intermediários.
+
+    Args:
+        samples: Array float, (frames,) ou (frames, canais)
+        frame_rate: Taxa de amostragem
+        sample_width: Bytes por amostra
+        scale: Multiplicador até a escala inteira (padrão: valor máximo,
+            ou seja, amostras em [-1, 1]; use 1 se já estão na escala inteira)
+    """
+    samples = np.asarray(samples)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    buffer = empty_buffer(len(samples), channels, sample_width)
+
+    info = np.iinfo(buffer.dtype)
+    if scale is None:
+        scale = info.max
+    np.clip(samples * scale, info.min, info.max, out=buffer, casting='unsafe')
+    return from_array(buffer, frame_rate, channels)
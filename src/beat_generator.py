@@ -5,14 +5,43 @@ Cria beats programaticamente usando MIDI e síntese de áudio
 
 from midiutil import MIDIFile
 import numpy as np
-from pydub import AudioSegment
 from pydub.generators import Sine, Square, WhiteNoise
 import random
+from render_quality import get_quality
+from audio_buffer import from_float
+
+
+# Padrões de bateria por estilo (beats dentro da barra)
+DRUM_PATTERNS = {
+    'funk': {
+        'kick': [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5],  # Funk carioca
+        'snare': [1, 3],
+        'hihat': [i/4 for i in range(16)],  # 16th notes
+    },
+    'pop': {
+        'kick': [0, 1, 2, 3],  # Four on the floor
+        'snare': [1, 3],
+        'hihat': [i/2 for i in range(8)],  # 8th notes
+    },
+}
+
+# Linhas de baixo (8 colcheias por compasso)
+BASS_PATTERNS = {
+    'funk': [36, 36, 38, 36, 36, 38, 36, 38],  # C, C, D, C pattern
+    'pop': [36, 43, 36, 43, 38, 43, 38, 43]     # C, G, C, G, D, G pattern
+}
+
+# Progressões de acordes (um acorde por compasso)
+CHORD_PROGRESSIONS = {
+    'funk': [[60, 63, 67, 70], [62, 65, 69, 72]],                    # Cm7, Dm7
+    'pop': [[60, 64, 67], [55, 59, 62], [57, 60, 64], [53, 57, 60]]  # C, G, Am, F
+}
 
 
 class BeatGenerator:
-    def __init__(self, tempo=120):
+    def __init__(self, tempo=120, quality=None):
         self.tempo = tempo
+        self.quality = get_quality(quality)
         self.midi = MIDIFile(4)  # 4 tracks: kick, snare, hihat, bass
         
         # Configurar tracks
@@ -32,8 +61,7 @@ class BeatGenerator:
             base_time = bar * 4  # 4 beats por barra
             
             # Kick pattern (funk carioca style)
-            kick_pattern = [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5]
-            for beat in kick_pattern:
+            for beat in DRUM_PATTERNS['funk']['kick']:
                 self.midi.addNote(self.track_kick, 0, 36, base_time + beat, 0.25, 100)
             
             # Snare (backbeat)
@@ -52,8 +80,7 @@ class BeatGenerator:
             base_time = bar * 4
             
             # Kick (four on the floor com variações)
-            kick_pattern = [0, 1, 2, 3]
-            for beat in kick_pattern:
+            for beat in DRUM_PATTERNS['pop']['kick']:
                 self.midi.addNote(self.track_kick, 0, 36, base_time + beat, 0.5, 100)
             
             # Snare/Clap (backbeat)
@@ -67,17 +94,61 @@ class BeatGenerator:
     
     def add_bassline(self, pattern='funk', bars=4):
         """Adiciona linha de baixo"""
-        notes = {
-            'funk': [36, 36, 38, 36, 36, 38, 36, 38],  # C, C, D, C pattern
-            'pop': [36, 43, 36, 43, 38, 43, 38, 43]     # C, G, C, G, D, G pattern
-        }
+        for time, duration, note, velocity in self.bassline_events(pattern, bars):
+            self.midi.addNote(self.track_bass, 0, note, time, duration, velocity)
+    
+    @staticmethod
+    def bassline_events(pattern='funk', bars=4):
+        """
+        Notas da linha de baixo como eventos
         
-        bass_notes = notes.get(pattern, notes['funk'])
+        Returns:
+            Lista de (beat, duração em beats, nota MIDI, velocity)
+        """
+        bass_notes = BASS_PATTERNS.get(pattern, BASS_PATTERNS['funk'])
         
+        events = []
         for bar in range(bars):
             for i, note in enumerate(bass_notes):
-                time = bar * 4 + i/2
-                self.midi.addNote(self.track_bass, 0, note, time, 0.4, 80)
+                events.append((bar * 4 + i/2, 0.4, note, 80))
+        return events
+    
+    @staticmethod
+    def kick_times(pattern='funk', tempo=120, duration_ms=30000):
+        """
+        Instantes (ms) de todos os kicks do padrão, igual a build_audio_track
+        
+        Returns:
+            Lista ordenada de posições em ms
+        """
+        kicks = DRUM_PATTERNS.get(pattern, DRUM_PATTERNS['pop'])['kick']
+        beat_duration = 60000 / tempo
+        bars = int(duration_ms / (beat_duration * 4)) + 1
+        
+        times = []
+        for bar in range(bars):
+            for beat in kicks:
+                position = int(bar * beat_duration * 4 + beat * beat_duration)
+                if position < duration_ms:
+                    times.append(position)
+        return times
+    
+    @staticmethod
+    def chord_events(pattern='pop', bars=4):
+        """
+        Progressão de acordes como eventos (um acorde por compasso)
+        
+        Returns:
+            Lista de (beat, duração em beats, nota MIDI, velocity)
+        """
+        progression = CHORD_PROGRESSIONS.get(pattern, CHORD_PROGRESSIONS['pop'])
+        
+        events = []
+        for bar in range(bars):
+            chord = progression[bar % len(progression)]
+            for note in chord:
+                events.append((bar * 4, 3.75, note, 70))
+        return events
     
     def save_midi(self, filename):
         """Salva o MIDI gerado"""
@@ -86,14 +157,16 @@ class BeatGenerator:
         print(f"✓ MIDI salvo: {filename}")
     
     @staticmethod
-    def create_808_kick():
+    def create_808_kick(quality=None):
         """Cria um kick 808 sintético"""
+        quality = get_quality(quality)
+        rate = quality.sample_rate
         duration = 500  # ms
         
         # Fundamental (baixa frequência com pitch envelope)
-        t = np.linspace(0, duration/1000, int(44100 * duration/1000))
+        t = np.linspace(0, duration/1000, int(rate * duration/1000))
         freq_envelope = 60 * np.exp(-8 * t)  # Pitch decay
-        phase = 2 * np.pi * np.cumsum(freq_envelope) / 44100
+        phase = 2 * np.pi * np.cumsum(freq_envelope) / rate
         kick = np.sin(phase)
         
         # Amplitude envelope
@@ -101,32 +174,21 @@ class BeatGenerator:
         kick = kick * amp_envelope
         
         # Converter para AudioSegment
-        kick_normalized = np.int16(kick * 32767)
-        kick_audio = AudioSegment(
-            kick_normalized.tobytes(),
-            frame_rate=44100,
-            sample_width=2,
-            channels=1
-        )
-        return kick_audio
+        return from_float(kick, rate)
     
     @staticmethod
-    def create_snare():
+    def create_snare(quality=None):
         """Cria um snare sintético"""
+        quality = get_quality(quality)
+        rate = quality.sample_rate
         duration = 200
         
         # Tom (componente tonal)
-        tone = Sine(200).to_audio_segment(duration=duration)
+        tone = Sine(200, sample_rate=rate).to_audio_segment(duration=duration)
         
         # Ruído (componente de ruído)
-        noise_samples = np.random.uniform(-1, 1, int(44100 * duration/1000))
-        noise_normalized = np.int16(noise_samples * 32767 * 0.3)
-        noise = AudioSegment(
-            noise_normalized.tobytes(),
-            frame_rate=44100,
-            sample_width=2,
-            channels=1
-        )
+        noise_samples = np.random.uniform(-1, 1, int(rate * duration/1000))
+        noise = from_float(noise_samples, rate, scale=32767 * 0.3)
         
         # Mixar
         snare = tone.overlay(noise)
@@ -135,19 +197,15 @@ class BeatGenerator:
         return snare.fade_out(150)
     
     @staticmethod
-    def create_hihat():
+    def create_hihat(quality=None):
         """Cria um hi-hat sintético"""
+        quality = get_quality(quality)
+        rate = quality.sample_rate
         duration = 50
         
         # Ruído filtrado (high-pass)
-        noise_samples = np.random.uniform(-1, 1, int(44100 * duration/1000))
-        noise_normalized = np.int16(noise_samples * 32767 * 0.15)
-        hihat = AudioSegment(
-            noise_normalized.tobytes(),
-            frame_rate=44100,
-            sample_width=2,
-            channels=1
-        )
+        noise_samples = np.random.uniform(-1, 1, int(rate * duration/1000))
+        hihat = from_float(noise_samples, rate, scale=32767 * 0.15)
         
         return hihat.fade_out(30)
 
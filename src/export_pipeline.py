@@ -0,0 +1,174 @@
+"""
+Export Pipeline - Exportação multi-formato em paralelo
+Envia o PCM do master já renderizado por pipes para vários encoders
+ao mesmo tempo, sem arquivos intermediários, e grava o índice de picos
+da forma de onda enquanto os encoders trabalham
+"""
+
+import audioop
+import os
+import subprocess
+import threading
+import time
+import wave
+from pydub import AudioSegment
+from pydub.exceptions import CouldntEncodeError
+from peak_index import PEAK_EXTENSION, write_peak_index
+
+
+# Argumentos do ffmpeg por formato
+ENCODERS = {
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '320k', '-f', 'mp3'],
+    'ogg': ['-c:a', 'libvorbis', '-q:a', '8', '-f', 'ogg'],
+    'flac': ['-c:a', 'flac', '-f', 'flac'],
+}
+
+# WAV não precisa de encoder: o PCM é gravado direto
+NATIVE_FORMATS = ('wav',)
+
+# Outros formatos (m4a, aac, ...) vão pelo export do pydub, como antes
+FALLBACK_BITRATE = '320k'
+
+CHUNK_BYTES = 1 << 16
+
+
+def _pcm_format(track):
+    """Formato do PCM cru para o ffmpeg (s16le, s32le, ...)"""
+    if track.sample_width == 1:
+        return 's8'  # O pydub guarda 8 bits como signed (audioop.bias no load)
+    return f's{track.sample_width * 8}le'
+
+
+def _feed(process, data, job):
+    """Escreve o PCM no stdin do encoder em blocos (sem copiar o buffer)"""
+    try:
+        for offset in range(0, len(data), CHUNK_BYTES):
+            process.stdin.write(data[offset:offset + CHUNK_BYTES])
+    except (BrokenPipeError, OSError) as e:
+        job['error'] = e
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+    job['stderr'] = process.stderr.read()
+    process.stderr.close()
+    job['returncode'] = process.wait()
+    job['finished'] = time.perf_counter()
+
+
+def _write_wav(track, path, data, job):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(track.channels)
+        f.setsampwidth(track.sample_width)
+        f.setframerate(track.frame_rate)
+        for offset in range(0, len(data), CHUNK_BYTES):
+            chunk = data[offset:offset + CHUNK_BYTES]
+            if track.sample_width == 1:
+                chunk = audioop.bias(chunk, 1, 128)  # WAV de 8 bits é unsigned
+            f.writeframesraw(chunk)
+    job['returncode'] = 0
+    job['finished'] = time.perf_counter()
+
+
+def _export_pydub(track, path, fmt, job):
+    """Formato sem encoder próprio: delega ao pydub (ffmpeg com -f fmt)"""
+    try:
+        track.export(path, format=fmt, bitrate=FALLBACK_BITRATE)
+        job['returncode'] = 0
+    except Exception as e:
+        job['error'] = e
+    job['finished'] = time.perf_counter()
+
+
+def export_formats(track, basename, formats=('mp3', 'ogg', 'flac', 'wav'), peaks=True):
+    """
+    Exporta um master em vários formatos ao mesmo tempo
+
+    Args:
+        track: AudioSegment já masterizado (não é normalizado de novo)
+        basename: Caminho de saída sem extensão
+        formats: Formatos desejados ('mp3', 'ogg', 'flac', 'wav'; os demais,
+            como 'm4a' ou 'aac', vão pelo export do pydub)
+        peaks: Gravar também o índice de picos (<basename>.peaks), lido
+            do mesmo PCM enquanto os encoders rodam
+
+    Returns:
+        Dict formato -> {'path', 'seconds', 'bytes'} (mais 'peaks', se pedido)
+    """
+    data = memoryview(track.raw_data)
+    jobs = {}
+
+    # Subir todos os encoders antes de enviar qualquer dado
+    for fmt in formats:
+        path = f'{basename}.{fmt}'
+        started = time.perf_counter()
+        job = {'path': path, 'started': started}
+        if fmt in NATIVE_FORMATS:
+            job['thread'] = threading.Thread(target=_write_wav, args=(track, path, data, job))
+            job['thread'].start()
+            jobs[fmt] = job
+            continue
+        if fmt not in ENCODERS:
+            job['thread'] = threading.Thread(target=_export_pydub, args=(track, path, fmt, job))
+            job['thread'].start()
+            jobs[fmt] = job
+            continue
+
+        command = [
+            AudioSegment.converter, '-y', '-loglevel', 'error',
+            '-f', _pcm_format(track),
+            '-ar', str(track.frame_rate),
+            '-ac', str(track.channels),
+            '-i', 'pipe:0',
+        ] + ENCODERS[fmt] + [path]
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        except OSError as e:
+            # Encerrar o que já foi iniciado antes de falhar
+            for started_job in jobs.values():
+                if 'process' in started_job:
+                    started_job['process'].kill()
+                started_job['thread'].join()
+            raise CouldntEncodeError(f"Não foi possível iniciar o encoder ({AudioSegment.converter}): {e}")
+        job['process'] = process
+        job['thread'] = threading.Thread(target=_feed, args=(process, data, job))
+        job['thread'].start()
+        jobs[fmt] = job
+
+    results = {}
+    try:
+        if peaks:
+            path = f'{basename}.{PEAK_EXTENSION}'
+            started = time.perf_counter()
+            size = write_peak_index(track, path)
+            results[PEAK_EXTENSION] = {
+                'path': path,
+                'seconds': time.perf_counter() - started,
+                'bytes': size,
+            }
+    finally:
+        # Os encoders terminam (e são aguardados) mesmo se o índice falhar
+        for job in jobs.values():
+            job['thread'].join()
+
+    failures = []
+    for fmt, job in jobs.items():
+        if job.get('returncode') != 0 or job.get('error'):
+            stderr = job.get('stderr', b'').decode('utf-8', 'replace').strip()
+            failures.append(f"{fmt}: {stderr or job.get('error')}")
+            continue
+        results[fmt] = {
+            'path': job['path'],
+            'seconds': job['finished'] - job['started'],
+            'bytes': os.path.getsize(job['path']),
+        }
+
+    if failures:
+        raise CouldntEncodeError("Falha ao exportar: " + "; ".join(failures))
+    return results
@@ -0,0 +1,268 @@
+"""
+Loudness - Medição de loudness (LUFS) e masterização por alvo
+Mede loudness integrada (ITU-R BS.1770, K-weighting com gating) e
+true-peak em uma única passada por blocos, e aplica um único estágio
+de ganho + limiter para atingir o alvo
+"""
+
+import numpy as np
+from audio_buffer import as_array, as_float, from_float
+
+
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+GATE_BLOCK_MS = 400
+GATE_HOP_MS = 100
+OVERSAMPLE = 4
+
+_k_filter_cache = {}
+_oversample_filter = None
+
+
+def _biquad_impulse(b, a, length):
+    """Resposta ao impulso de um biquad (calculada uma vez por taxa)"""
+    b = np.asarray(b) / a[0]
+    a = np.asarray(a) / a[0]
+    h = np.zeros(length)
+    x1 = x2 = y1 = y2 = 0.0
+    for n in range(length):
+        x0 = 1.0 if n == 0 else 0.0
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        h[n] = y0
+        x2, x1 = x1, x0
+        y2, y1 = y1, y0
+    return h
+
+
+def k_weighting_filter(frame_rate):
+    """
+    Filtro K (shelf de agudos + passa-altas) como resposta ao impulso
+
+    As duas etapas IIR da BS.1770 decaem abaixo de -200 dB em ~250 ms,
+    então a resposta truncada é aplicada por convolução FFT (vetorizada).
+    """
+    if frame_rate in _k_filter_cache:
+        return _k_filter_cache[frame_rate]
+
+    # Etapa 1: shelf de agudos (+4 dB acima de ~1.7 kHz)
+    gain_db, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    K = np.tan(np.pi * fc / frame_rate)
+    Vh = 10 ** (gain_db / 20)
+    Vb = Vh ** 0.4996667741545416
+    shelf_b = [Vh + Vb * K / q + K * K, 2 * (K * K - Vh), Vh - Vb * K / q + K * K]
+    shelf_a = [1 + K / q + K * K, 2 * (K * K - 1), 1 - K / q + K * K]
+
+    # Etapa 2: passa-altas (~38 Hz)
+    q, fc = 0.5003270373238773, 38.13547087602444
+    K = np.tan(np.pi * fc / frame_rate)
+    hp_a = [1 + K / q + K * K, 2 * (K * K - 1), 1 - K / q + K * K]
+    hp_b = [hp_a[0], -2 * hp_a[0], hp_a[0]]  # [1, -2, 1] após normalizar por a0
+
+    length = int(frame_rate * 0.25)
+    h = np.convolve(
+        _biquad_impulse(shelf_b, shelf_a, length),
+        _biquad_impulse(hp_b, hp_a, length)
+    )[:length]
+    _k_filter_cache[frame_rate] = h
+    return h
+
+
+def _oversampling_phases():
+    """Filtro polifásico de interpolação 4x (sinc janelado, 48 taps)"""
+    global _oversample_filter
+    if _oversample_filter is None:
+        taps = 12 * OVERSAMPLE
+        n = np.arange(taps) - (taps - 1) / 2
+        h = np.sinc(n / OVERSAMPLE) * np.kaiser(taps, 8.0)
+        phases = np.stack([h[p::OVERSAMPLE] for p in range(OVERSAMPLE)])
+        _oversample_filter = phases / phases.sum(axis=1, keepdims=True)
+    return _oversample_filter
+
+
+def true_peak_envelope(samples, history=None):
+    """
+    Magnitude máxima entre as fases do sinal sobreamostrado 4x
+
+    Args:
+        samples: Array (frames,) de um canal
+        history: Últimas amostras do bloco anterior (para streaming)
+
+    Returns:
+        (magnitude por frame, nova history)
+    """
+    phases = _oversampling_phases()
+    taps = phases.shape[1]
+    if history is None:
+        history = np.zeros(taps - 1)
+    extended = np.concatenate((history, samples))
+    peak = np.abs(samples)
+    for phase in phases:
+        peak = np.maximum(peak, np.abs(np.convolve(extended, phase, mode='valid')))
+    return peak, extended[-(taps - 1):]
+
+
+class LoudnessMeter:
+    def __init__(self, frame_rate, channels=1):
+        """
+        Medidor de loudness em streaming (alimentar com process())
+
+        Args:
+            frame_rate: Taxa de amostragem
+            channels: Número de canais
+        """
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self._filter = k_weighting_filter(frame_rate)
+        self._spectra = {}
+        self._tail = np.zeros((len(self._filter) - 1, channels))
+        self._peak_history = [None] * channels
+        self._hop = int(frame_rate * GATE_HOP_MS / 1000)
+        self._pending = np.zeros(0)
+        self._hop_energy = []
+        self.true_peak = 0.0
+        self.sample_peak = 0.0
+
+    def _k_filter(self, block):
+        """Convolução FFT (overlap-add) do bloco com o filtro K"""
+        h = self._filter
+        out_len = len(block) + len(h) - 1
+        size = 1 << int(np.ceil(np.log2(out_len)))
+        if size not in self._spectra:
+            self._spectra[size] = np.fft.rfft(h, size)
+        spectrum = self._spectra[size]
+        filtered = np.fft.irfft(np.fft.rfft(block, size, axis=0) * spectrum[:, None], size, axis=0)[:out_len]
+
+        tail_len = len(self._tail)
+        filtered[:tail_len] += self._tail
+        self._tail = filtered[len(block):len(block) + tail_len].copy()
+        return filtered[:len(block)]
+
+    def process(self, block):
+        """
+        Mede um bloco de áudio
+
+        Args:
+            block: Array float (frames, canais) ou (frames,) em [-1, 1]
+        """
+        block = np.asarray(block, dtype=np.float64).reshape(-1, self.channels)
+        if len(block) == 0:
+            return
+
+        self.sample_peak = max(self.sample_peak, float(np.abs(block).max()))
+        for ch in range(self.channels):
+            peak, self._peak_history[ch] = true_peak_envelope(block[:, ch], self._peak_history[ch])
+            self.true_peak = max(self.true_peak, float(peak.max()))
+
+        # Energia ponderada (soma dos canais) acumulada em hops de 100 ms
+        energy = np.sum(self._k_filter(block) ** 2, axis=1)
+        energy = np.concatenate((self._pending, energy))
+        full = len(energy) // self._hop * self._hop
+        if full:
+            self._hop_energy.extend(energy[:full].reshape(-1, self._hop).mean(axis=1))
+        self._pending = energy[full:]
+
+    @property
+    def integrated(self):
+        """Loudness integrada (LUFS) com gating absoluto e relativo"""
+        hops = np.array(self._hop_energy)
+        per_block = GATE_BLOCK_MS // GATE_HOP_MS
+        if len(hops) < per_block:
+            # Áudio mais curto que um bloco de gating: usar tudo que houver
+            energy = np.concatenate((hops * self._hop, self._pending))
+            total = len(hops) * self._hop + len(self._pending)
+            blocks = np.array([energy.sum() / total]) if total else np.zeros(0)
+        else:
+            window = np.ones(per_block) / per_block
+            blocks = np.convolve(hops, window, mode='valid')
+
+        with np.errstate(divide='ignore'):
+            loudness = -0.691 + 10 * np.log10(blocks)
+        gated = blocks[loudness > ABSOLUTE_GATE_LUFS]
+        if len(gated) == 0:
+            return float('-inf')
+
+        relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+        gated = blocks[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+    @property
+    def true_peak_db(self):
+        """True-peak em dBTP"""
+        return float(20 * np.log10(self.true_peak)) if self.true_peak > 0 else float('-inf')
+
+    def stats(self):
+        return {
+            'integrated_lufs': self.integrated,
+            'true_peak_dbtp': self.true_peak_db,
+            'sample_peak_dbfs': float(20 * np.log10(self.sample_peak)) if self.sample_peak > 0 else float('-inf'),
+        }
+
+
+def measure(track, block_ms=1000):
+    """Mede loudness e true-peak de um AudioSegment em uma única passada"""
+    meter = LoudnessMeter(track.frame_rate, track.channels)
+    samples = as_array(track).reshape(-1, track.channels)
+    scale = float(track.max_possible_amplitude)
+    block = max(1, int(track.frame_rate * block_ms / 1000))
+    for start in range(0, len(samples), block):
+        meter.process(samples[start:start + block] / scale)
+    return meter.stats()
+
+
+def limiter_gain(samples, ceiling, window):
+    """
+    Curva de ganho do limiter (vetorizada, com lookahead de uma janela)
+
+    O ganho necessário é calculado por janela a partir do true-peak, cada
+    janela usa o mínimo entre ela e as vizinhas e a curva é interpolada
+    linearmente entre os centros, então nenhuma amostra passa do teto.
+    """
+    frames = len(samples)
+    peak = np.zeros(frames)
+    for ch in range(samples.shape[1]):
+        peak = np.maximum(peak, true_peak_envelope(samples[:, ch])[0])
+
+    n_windows = -(-frames // window)
+    padded = np.zeros(n_windows * window)
+    padded[:frames] = peak
+    window_peak = padded.reshape(n_windows, window).max(axis=1)
+    with np.errstate(divide='ignore'):
+        required = np.minimum(1.0, ceiling / window_peak)
+
+    # Mínimo com as janelas vizinhas (lookahead e release de uma janela)
+    neighbours = np.minimum(required, np.minimum(np.roll(required, 1), np.roll(required, -1)))
+    neighbours[0] = min(required[0], required[1] if n_windows > 1 else 1.0)
+    neighbours[-1] = min(required[-1], required[-2] if n_windows > 1 else 1.0)
+
+    centers = np.arange(n_windows) * window + window / 2
+    return np.interp(np.arange(frames), centers, neighbours)
+
+
+def master_to_lufs(track, target_lufs=-14.0, ceiling_db=-1.0, window_ms=5):
+    """
+    Masteriza para um alvo de loudness com um único estágio de ganho + limiter
+
+    Args:
+        track: AudioSegment
+        target_lufs: Loudness integrada desejada (LUFS)
+        ceiling_db: Teto de true-peak (dBTP)
+        window_ms: Janela de lookahead do limiter
+
+    Returns:
+        (AudioSegment masterizado, dict com medições e ganho aplicado)
+    """
+    stats = measure(track)
+    if stats['integrated_lufs'] == float('-inf'):
+        return track, dict(stats, gain_db=0.0)
+
+    gain_db = target_lufs - stats['integrated_lufs']
+    samples = as_float(track).reshape(-1, track.channels) * 10 ** (gain_db / 20)
+
+    ceiling = 10 ** (ceiling_db / 20)
+    window = max(1, int(track.frame_rate * window_ms / 1000))
+    samples *= limiter_gain(samples, ceiling, window)[:, None]
+
+    if track.channels == 1:
+        samples = samples[:, 0]
+    mastered = from_float(samples, track.frame_rate, track.sample_width, scale=track.max_possible_amplitude)
+    return mastered, dict(stats, gain_db=gain_db)
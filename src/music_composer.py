@@ -6,17 +6,35 @@ Combina batidas, vozes e efeitos para criar músicas completas
 from pydub import AudioSegment
 from pydub.effects import normalize, compress_dynamic_range
 from pydub.playback import play
+from pydub.silence import detect_leading_silence
 import os
-from beat_generator import BeatGenerator
+import numpy as np
+from beat_generator import BeatGenerator, DRUM_PATTERNS
 from voice_generator import VoiceGenerator
+from arrangement import ArrangementTimeline, DEFAULT_SECTIONS
+from vocal_chop import VocalChopEngine
+from export_pipeline import export_formats
+from render_quality import get_quality
+from loudness import master_to_lufs
+from synth_engine import PolySynth
+from audio_buffer import as_array, from_float
+from sidechain import Sidechain
+from time_stretch import fit_to_duration
 
 
 class MusicComposer:
-    def __init__(self, tempo=120):
+    def __init__(self, tempo=120, quality=None):
         self.tempo = tempo
-        self.beat_gen = BeatGenerator(tempo=tempo)
-        self.voice_gen = VoiceGenerator()
+        self.quality = get_quality(quality)  # 'draft' para previews, 'final' padrão
+        self.target_lufs = -14.0  # Loudness alvo da masterização
+        self.ceiling_db = -1.0    # Teto de true-peak (dBTP)
+        self.beat_gen = BeatGenerator(tempo=tempo, quality=self.quality)
+        self.voice_gen = VoiceGenerator(quality=self.quality)
         self.tracks = {}
+        self._sample_cache = {}
+        self.sidechain = None  # Ducking pelo kick (ver enable_sidechain)
+        self._last_kick_times = None  # Kicks (ms) da última faixa renderizada
+        self.shared_samples = None  # Samples em memória compartilhada (sample_bank)
         
         # Definir diretórios base
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,73 +65,215 @@ class MusicComposer:
         
         return midi_file
     
-    def build_audio_track(self, style='funk', duration_seconds=30):
+    def build_audio_track(self, style='funk', duration_seconds=30, bass=True):
         """
         Constrói faixa de áudio completa com samples
         
         Args:
             style: 'funk' ou 'pop'
             duration_seconds: Duração total em segundos
+            bass: Incluir a linha de baixo sintetizada
         """
         print(f"\n🎶 Construindo faixa de áudio {style}...\n")
         
-        # Criar samples sintéticos se não existirem
-        self._ensure_samples()
-        
-        # Carregar samples
-        kick = AudioSegment.from_wav(os.path.join(self.samples_dir, "kick_808.wav"))
-        snare = AudioSegment.from_wav(os.path.join(self.samples_dir, "snare.wav"))
-        hihat = AudioSegment.from_wav(os.path.join(self.samples_dir, "hihat.wav"))
+        # Carregar samples (gera os sintéticos se não existirem)
+        samples = self._load_samples()
+        kick = samples['kick']
+        snare = samples['snare']
+        hihat = samples['hihat']
         
         # Calcular timing baseado no BPM
         beat_duration = 60000 / self.tempo  # ms por beat
         
-        # Criar faixa vazia
-        track = AudioSegment.silent(duration=duration_seconds * 1000)
+        # Criar faixa vazia (buffer de mixagem NumPy)
+        rate = self.quality.sample_rate
+        duration_ms = duration_seconds * 1000
+        mix = np.zeros(int(rate * duration_ms / 1000), dtype=np.int32)
+        
+        def place(sound, position):
+            start = int(position * rate / 1000)
+            length = min(len(sound), len(mix) - start)
+            mix[start:start + length] += sound[:length]
+        
+        # Samples vistos como arrays (sem cópia); hi-hat com volume por velocity
+        kick = self._sample_array("kick_808.wav", kick)
+        snare = self._sample_array("snare.wav", snare)
+        hats = {
+            velocity: as_array(hihat - (20 * (1 - velocity)))  # Variar volume
+            for velocity in (0.8, 0.5)
+        }
         
-        # Padrões rítmicos
-        if style == 'funk':
-            kick_pattern = [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5]  # Beats na barra
-            snare_pattern = [1, 3]
-            hihat_pattern = [i/4 for i in range(16)]  # 16th notes
-        else:  # pop
-            kick_pattern = [0, 1, 2, 3]
-            snare_pattern = [1, 3]
-            hihat_pattern = [i/2 for i in range(8)]  # 8th notes
+        # Padrões rítmicos (beats na barra)
+        pattern = DRUM_PATTERNS['funk' if style == 'funk' else 'pop']
+        kick_pattern = pattern['kick']
+        snare_pattern = pattern['snare']
+        hihat_pattern = pattern['hihat']
         
         # Construir batida loop
-        bars = int((duration_seconds * 1000) / (beat_duration * 4)) + 1
+        bars = int(duration_ms / (beat_duration * 4)) + 1
+        kick_times = []
         
         for bar in range(bars):
             bar_start = bar * beat_duration * 4
             
-            # Adicionar kicks
+            # Adicionar kicks (posições guardadas para o sidechain)
             for beat in kick_pattern:
                 position = int(bar_start + beat * beat_duration)
-                if position < len(track):
-                    track = track.overlay(kick, position=position)
+                if position < duration_ms:
+                    place(kick, position)
+                    kick_times.append(position)
             
             # Adicionar snares
             for beat in snare_pattern:
                 position = int(bar_start + beat * beat_duration)
-                if position < len(track):
-                    track = track.overlay(snare, position=position)
+                if position < duration_ms:
+                    place(snare, position)
             
             # Adicionar hi-hats
             for beat in hihat_pattern:
                 position = int(bar_start + beat * beat_duration)
-                if position < len(track):
+                if position < duration_ms:
                     velocity = 0.8 if int(beat * 4) % 2 == 0 else 0.5
-                    hat = hihat - (20 * (1 - velocity))  # Variar volume
-                    track = track.overlay(hat, position=position)
+                    place(hats[velocity], position)
         
-        # Normalizar e comprimir
-        track = normalize(track)
-        track = compress_dynamic_range(track)
+        # Adicionar baixo (synth polifônico, mesmo padrão do MIDI)
+        if bass:
+            bass_track = self.render_bass(style, duration_ms)
+            if self.sidechain:
+                bass_track = self._duck(bass_track, kick_times=kick_times)
+            place(as_array(bass_track), 0)
+        
+        self._last_kick_times = sorted(kick_times)
+        track = from_float(mix, rate, scale=1)
+        
+        # Normalizar e comprimir (o preset draft pula a masterização)
+        if self.quality.mastering:
+            track = normalize(track)
+            track = compress_dynamic_range(track)
         
         return track
     
-    def add_vocals(self, track, lyrics, start_time=4000):
+    def render_bass(self, style='funk', duration_ms=30000):
+        """
+        Renderiza a linha de baixo do estilo em áudio
+        
+        Args:
+            style: 'funk' ou 'pop'
+            duration_ms: Duração (ms)
+        """
+        bars = int(duration_ms / (60000 / self.tempo * 4)) + 1
+        events = self.beat_gen.bassline_events(pattern=style, bars=bars)
+        synth = PolySynth(
+            frame_rate=self.quality.sample_rate,
+            voices=2,
+            waveform='triangle',
+            attack_ms=5,
+            decay_ms=80,
+            sustain=0.8,
+            release_ms=60,
+            gain_db=-6
+        )
+        return synth.render(self._beats_to_ms(events), length_ms=duration_ms)
+    
+    def add_chords(self, track, style='pop', start_time=0, voices=8, waveform='saw'):
+        """
+        Adiciona a progressão de acordes do estilo (synth polifônico)
+        
+        Args:
+            track: AudioSegment da faixa base
+            style: 'funk' ou 'pop'
+            start_time: Quando começar (ms)
+            voices: Máximo de notas simultâneas
+            waveform: 'sine', 'saw', 'square' ou 'triangle'
+        """
+        print(f"\n🎹 Adicionando acordes ({style})...")
+        
+        duration_ms = len(track) - start_time
+        bars = int(duration_ms / (60000 / self.tempo * 4)) + 1
+        events = self.beat_gen.chord_events(pattern=style, bars=bars)
+        synth = PolySynth(
+            frame_rate=track.frame_rate,
+            voices=voices,
+            waveform=waveform,
+            attack_ms=30,
+            decay_ms=300,
+            sustain=0.6,
+            release_ms=300,
+            gain_db=-20
+        )
+        chords = synth.render(self._beats_to_ms(events), length_ms=duration_ms)
+        if self.sidechain:
+            chords = self._duck(chords, position_ms=start_time)
+        
+        print("✓ Acordes adicionados")
+        return track.overlay(chords, position=start_time)
+    
+    def enable_sidechain(self, style='funk', depth_db=-6, attack_ms=5, release_ms=180,
+                         kick_times=None):
+        """
+        Liga o sidechain: baixo, acordes, melodia e vocais "respiram" no kick
+        
+        A curva de ganho vem direto dos instantes dos kicks, então o efeito
+        custa uma multiplicação por camada (sem compressor). Todas as
+        camadas usam os kicks que a última faixa renderizada tocou
+        (build_audio_track ou create_song_structure); style só vale quando
+        nada foi renderizado ainda, e kick_times substitui os dois.
+        
+        Args:
+            style: Padrão de kick usado antes de qualquer render ('funk' ou 'pop')
+            depth_db: Redução máxima de ganho no kick (dB)
+            attack_ms: Tempo até a redução máxima
+            release_ms: Tempo de volta ao ganho normal
+            kick_times: Instantes dos kicks (ms), ex.: timeline.kick_times()
+        """
+        self.sidechain = Sidechain(
+            kick_times_ms=kick_times,
+            style=style,
+            tempo=self.tempo,
+            depth_db=depth_db,
+            attack_ms=attack_ms,
+            release_ms=release_ms
+        )
+        return self.sidechain
+    
+    def disable_sidechain(self):
+        """Desliga o sidechain"""
+        self.sidechain = None
+    
+    def _duck(self, layer, position_ms=0, kick_times=None):
+        """
+        Aplica o sidechain em uma camada
+        
+        Ordem dos kicks: os passados aqui, os dados em enable_sidechain, os
+        da última faixa renderizada e, sem nenhum deles, o padrão do estilo
+        no tempo atual do compositor.
+        """
+        if kick_times is None and self.sidechain.kick_times_ms is None:
+            kick_times = self._last_kick_times
+        return self.sidechain.apply(
+            layer,
+            position_ms=position_ms,
+            kick_times_ms=kick_times,
+            tempo=self.tempo
+        )
+    
+    def _section_bass(self, style, duration_ms):
+        """Baixo de uma seção da linha do tempo (com sidechain nos kicks da seção)"""
+        bass = self.render_bass(style, duration_ms)
+        if self.sidechain:
+            kick_times = self.beat_gen.kick_times(style, self.tempo, duration_ms)
+            bass = self._duck(bass, kick_times=kick_times)
+        return bass
+    
+    def _beats_to_ms(self, events):
+        """Converte eventos (beat, duração, nota, velocity) para ms"""
+        beat_duration = 60000 / self.tempo
+        return [
+            (beat * beat_duration, duration * beat_duration, note, velocity)
+            for beat, duration, note, velocity in events
+        ]
+    
+    def add_vocals(self, track, lyrics, start_time=4000, beats=None, bars=None):
         """
         Adiciona vocais à faixa
         
@@ -121,6 +281,8 @@ class MusicComposer:
             track: AudioSegment da faixa base
             lyrics: Texto ou arquivo de vocal
             start_time: Quando começar o vocal (ms)
+            beats: Encaixar a frase em exatamente N beats do tempo da faixa
+            bars: Encaixar a frase em N compassos (4 beats cada)
         """
         print("\n🎤 Adicionando vocais...")
         
@@ -135,12 +297,21 @@ class MusicComposer:
         vocal = AudioSegment.from_file(vocal_file)
         
         # Processar vocal (normalizar, EQ básico)
-        vocal = normalize(vocal)
+        vocal = normalize(vocal).set_frame_rate(track.frame_rate)
+        
+        # Travar a frase no grid: sem silêncio nas pontas e esticada (sem
+        # mudar o tom) para durar exatamente os beats pedidos
+        if bars is not None:
+            beats = bars * 4
+        if beats is not None:
+            vocal = self.fit_vocal(vocal, beats)
         
         # Adicionar reverb simples (simulado com eco)
         vocal_with_fx = vocal
         echo = vocal - 12  # -12dB
         vocal_with_fx = vocal_with_fx.overlay(echo, position=100)  # 100ms delay
+        if self.sidechain:
+            vocal_with_fx = self._duck(vocal_with_fx, position_ms=start_time)
         
         # Mixar com a faixa
         result = track.overlay(vocal_with_fx, position=start_time)
@@ -152,6 +323,75 @@ class MusicComposer:
         print("✓ Vocais adicionados")
         return result
     
+    def fit_vocal(self, vocal, beats, silence_thresh=-40):
+        """
+        Encaixa uma frase vocal em N beats do tempo atual (time-stretch WSOLA)
+        
+        Args:
+            vocal: AudioSegment da frase
+            beats: Duração desejada em beats
+            silence_thresh: Nível (dBFS) abaixo do qual as pontas são cortadas
+        """
+        start = detect_leading_silence(vocal, silence_threshold=silence_thresh)
+        end = len(vocal) - detect_leading_silence(vocal.reverse(), silence_threshold=silence_thresh)
+        if end > start:
+            vocal = vocal[start:end]
+        
+        duration_ms = beats * 60000 / self.tempo
+        print(f"  ↔️  Vocal: {len(vocal)}ms -> {duration_ms:.0f}ms ({beats:g} beats)")
+        return fit_to_duration(vocal, duration_ms)
+    
+    def add_vocal_chops(self, track, lyrics, beats=None, chop_beats=0.5,
+                        start_time=0, onsets=True, gain_db=-3):
+        """
+        Adiciona vocal chops sincronizados com o tempo da faixa
+        
+        Args:
+            track: AudioSegment da faixa base
+            lyrics: Texto ou arquivo de vocal
+            beats: Posições (em beats) de cada chop; padrão: padrão sincopado em todos os compassos
+            chop_beats: Duração de cada chop em beats
+            start_time: Onde o grid começa (ms)
+            onsets: Cortar nos ataques detectados do vocal
+            gain_db: Ganho dos chops na mixagem
+        """
+        print("\n🔪 Adicionando vocal chops...")
+        
+        # Se lyrics for texto, gerar TTS
+        if isinstance(lyrics, str) and not os.path.exists(lyrics):
+            vocal_file = os.path.join(self.output_dir, 'temp_chop.mp3')
+            self.voice_gen.text_to_speech(lyrics, filename=vocal_file)
+        else:
+            vocal_file = lyrics
+        
+        vocal = normalize(AudioSegment.from_file(vocal_file))
+        
+        # Padrão sincopado repetido em todos os compassos
+        if beats is None:
+            bars = int((len(track) - start_time) / (60000 / self.tempo * 4)) + 1
+            beats = [bar * 4 + b for bar in range(bars) for b in (0, 0.75, 1.5, 2.5, 3)]
+        
+        engine = VocalChopEngine(vocal.set_frame_rate(track.frame_rate))
+        chops = engine.chop_to_grid(
+            self.tempo,
+            beats,
+            chop_beats=chop_beats,
+            onsets=onsets,
+            start_time=start_time,
+            length_ms=len(track),
+            gain_db=gain_db
+        )
+        if self.sidechain:
+            chops = self._duck(chops)
+        result = track.overlay(chops)
+        
+        # Limpar temp
+        if 'temp_chop' in vocal_file and os.path.exists(vocal_file):
+            os.remove(vocal_file)
+        
+        print("✓ Vocal chops adicionados")
+        return result
+    
     def add_melody(self, track, notes, durations, start_time=0, instrument='synth'):
         """
         Adiciona melodia à faixa
@@ -172,6 +412,8 @@ class MusicComposer:
         # Carregar e processar
         melody = AudioSegment.from_wav(melody_file)
         melody = melody - 6  # Reduzir volume para mixagem
+        if self.sidechain:
+            melody = self._duck(melody, position_ms=start_time)
         
         # Adicionar à faixa
         result = track.overlay(melody, position=start_time)
@@ -183,55 +425,160 @@ class MusicComposer:
         print("✓ Melodia adicionada")
         return result
     
-    def create_song_structure(self, style='pop'):
+    def create_timeline(self, style='pop', sections=None, bass=True):
+        """
+        Cria a linha do tempo de uma música estruturada
+        
+        Args:
+            style: 'funk' ou 'pop'
+            sections: Lista de (nome, duração em segundos)
+            bass: Incluir a linha de baixo em cada seção (como build_audio_track)
+        """
+        return ArrangementTimeline(
+            self._load_samples(),
+            tempo=self.tempo,
+            style=style,
+            sections=sections or DEFAULT_SECTIONS,
+            bass=(lambda duration_ms: self._section_bass(style, duration_ms)) if bass else None,
+            master=self.quality.mastering
+        )
+    
+    def render_preview(self, start_ms, end_ms, style='pop', sections=None, bass=True):
+        """
+        Renderiza só um trecho da música estruturada (preview)
+        
+        Args:
+            start_ms: Início do trecho (ms)
+            end_ms: Fim do trecho (ms, exclusivo)
+            style: 'funk' ou 'pop'
+            sections: Lista de (nome, duração em segundos)
+            bass: Incluir a linha de baixo
+        """
+        timeline = self.create_timeline(style=style, sections=sections, bass=bass)
+        return timeline.render_range(start_ms, end_ms)
+    
+    def create_song_structure(self, style='pop', bass=True):
         """
         Cria estrutura completa de música (intro, verse, chorus, etc.)
+        
+        Renderiza pela linha do tempo, então qualquer trecho obtido com
+        render_preview é idêntico ao mesmo trecho desta música.
+        
+        Args:
+            style: 'funk' ou 'pop'
+            bass: Incluir a linha de baixo em cada seção
         """
         print(f"\n🎼 Criando estrutura completa de música {style}...\n")
         
-        # Definir seções (em segundos)
-        sections = {
-            'intro': 8,
-            'verse1': 16,
-            'chorus': 16,
-            'verse2': 16,
-            'chorus2': 16,
-            'outro': 8
-        }
-        
-        song = AudioSegment.empty()
+        timeline = self.create_timeline(style=style, bass=bass)
+        for section in timeline.sections:
+            print(f"  • {section.name}: {section.start_ms/1000:.0f}s - {section.end_ms/1000:.0f}s")
         
-        for section_name, duration in sections.items():
-            print(f"  • Construindo {section_name}...")
-            
-            # Criar seção
-            section = self.build_audio_track(style=style, duration_seconds=duration)
-            
-            # Aplicar efeitos específicos por seção
-            if 'intro' in section_name:
-                section = section.fade_in(2000)
-            elif 'outro' in section_name:
-                section = section.fade_out(3000)
-            elif 'chorus' in section_name:
-                # Chorus mais alto
-                section = section + 2
-            
-            song += section
+        song = timeline.render()
+        self._last_kick_times = timeline.kick_times()
         
         print("\n✓ Estrutura criada")
         return song
     
     def export_track(self, track, filename, format='mp3'):
         """Exporta a faixa final"""
-        # Normalização final
-        track = normalize(track)
-        
-        # Exportar
-        output_path = os.path.join(self.output_dir, f'{filename}.{format}')
-        track.export(output_path, format=format, bitrate='320k')
+        results = self.export_formats(track, filename, formats=[format])
+        output_path = results[format]['path']
         print(f"\n✅ Faixa exportada: {output_path}")
         return output_path
     
+    def export_formats(self, track, filename, formats=('mp3', 'ogg', 'flac', 'wav')):
+        """
+        Exporta a faixa final em vários formatos de uma vez
+        
+        A faixa é masterizada uma única vez (loudness alvo em LUFS) e o
+        mesmo PCM é enviado por pipes para todos os encoders em paralelo.
+        
+        Args:
+            track: AudioSegment da faixa
+            filename: Nome do arquivo (sem extensão)
+            formats: Formatos desejados ('mp3', 'ogg', 'flac', 'wav'; outros,
+                como 'm4a', vão pelo export do pydub)
+        
+        Returns:
+            Dict formato -> {'path', 'seconds', 'bytes'}
+        """
+        # Masterização final (uma vez para todos os formatos)
+        if self.quality.mastering:
+            track = self.master_track(track)
+        
+        basename = os.path.join(self.output_dir, filename)
+        results = export_formats(track, basename, formats=formats)
+        
+        for fmt, info in results.items():
+            print(f"  • {fmt}: {info['seconds']:.2f}s ({info['bytes'] / 1024:.0f} KB)")
+        return results
+    
+    def master_track(self, track):
+        """
+        Masteriza a faixa para o loudness alvo
+        
+        Mede LUFS integrado e true-peak em uma passada e aplica um único
+        estágio de ganho + limiter (target_lufs / ceiling_db).
+        """
+        mastered, stats = master_to_lufs(
+            track,
+            target_lufs=self.target_lufs,
+            ceiling_db=self.ceiling_db
+        )
+        print(f"🎚️  Loudness: {stats['integrated_lufs']:.1f} LUFS -> {self.target_lufs:.1f} LUFS "
+              f"(ganho {stats['gain_db']:+.1f} dB, teto {self.ceiling_db:.1f} dBTP)")
+        return mastered
+    
+    def _load_samples(self):
+        """
+        Carrega os samples de bateria (kick, snare, hihat)
+        
+        Os samples ficam em memória por pasta e qualidade, então renders
+        seguidos não leem os WAVs de novo. Os arquivos em disco são sempre
+        de qualidade final e são convertidos para o preset atual, então a
+        mesma música soa igual em draft e final.
+        
+        Com shared_samples (ver sample_bank.SharedSamples) os samples vêm da
+        memória compartilhada em vez do disco. Os AudioSegments do cache são
+        cópias; a mixagem usa os arrays compartilhados (ver _sample_array).
+        """
+        key = (self.samples_dir, self.quality.name)
+        if key not in self._sample_cache:
+            self._sample_cache[key] = {
+                name: self._read_sample(filename)
+                .set_channels(self.quality.channels)
+                .set_frame_rate(self.quality.sample_rate)
+                for name, filename in (
+                    ('kick', "kick_808.wav"),
+                    ('snare', "snare.wav"),
+                    ('hihat', "hihat.wav")
+                )
+            }
+        return self._sample_cache[key]
+    
+    def _read_sample(self, filename):
+        """Lê um sample da memória compartilhada ou da pasta de samples"""
+        if self.shared_samples is not None and filename in self.shared_samples:
+            return self.shared_samples[filename]
+        self._ensure_samples()
+        return AudioSegment.from_wav(os.path.join(self.samples_dir, filename))
+    
+    def _sample_array(self, filename, segment):
+        """
+        Amostras de um sample no formato da qualidade atual
+        
+        Usa o array da memória compartilhada (sem cópia) quando o sample
+        publicado já está no formato do preset; senão, vê o segmento.
+        """
+        if self.shared_samples is not None and filename in self.shared_samples:
+            descriptor = self.shared_samples.descriptors[filename]
+            if (descriptor['frame_rate'] == segment.frame_rate
+                    and descriptor['channels'] == segment.channels
+                    and descriptor['sample_width'] == segment.sample_width):
+                return self.shared_samples.array(filename)
+        return as_array(segment)
+    
     def _ensure_samples(self):
         """Garante que os samples existam"""
         samples_needed = {
@@ -0,0 +1,179 @@
+"""
+Peak Index - Índice de picos multi-resolução da forma de onda
+Min/max/RMS por bloco em vários níveis de zoom (estilo mipmap), gravados
+em um arquivo binário pequeno ao lado de cada exportação
+"""
+
+import struct
+import numpy as np
+from audio_buffer import as_array
+
+
+PEAK_EXTENSION = 'peaks'
+
+MAGIC = b'PKIX'
+VERSION = 1
+
+# magic, versão, níveis, fator, canais, taxa, bloco base, frames
+HEADER = struct.Struct('<4sHHHHIIQ')
+LEVEL_HEADER = struct.Struct('<II')  # tamanho do bloco (frames), número de blocos
+
+PEAK_DTYPE = np.dtype([('min', '<i2'), ('max', '<i2'), ('rms', '<i2')])
+
+BASE_BLOCK = 256   # Frames por ponto no nível mais detalhado
+ZOOM_FACTOR = 4    # Cada nível junta 4 blocos do anterior
+CHUNK_BLOCKS = 4096
+
+
+class PeakIndex:
+    def __init__(self, frame_rate, channels, frames, levels, factor=ZOOM_FACTOR):
+        """
+        Índice de picos de uma faixa
+
+        Args:
+            frame_rate: Taxa de amostragem da faixa
+            channels: Canais da faixa (os picos juntam todos os canais)
+            frames: Duração da faixa em frames
+            levels: Lista de (tamanho do bloco, array PEAK_DTYPE), do mais
+                detalhado para o mais geral; valores na escala de 16 bits
+            factor: Razão entre os tamanhos de bloco de níveis vizinhos
+        """
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.frames = frames
+        self.levels = levels
+        self.factor = factor
+
+    @classmethod
+    def from_track(cls, track, base_block=BASE_BLOCK, factor=ZOOM_FACTOR):
+        """
+        Calcula o índice a partir do PCM da faixa (sem decodificar nada)
+
+        O nível base é calculado em blocos de CHUNK_BLOCKS (memória
+        constante); os demais níveis saem do nível anterior.
+        """
+        samples = as_array(track)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        frames = len(samples)
+        scale = 32768 / track.max_possible_amplitude  # Tudo na escala de 16 bits
+
+        n_blocks = -(-frames // base_block)
+        mins = np.zeros(n_blocks)
+        maxs = np.zeros(n_blocks)
+        sumsq = np.zeros(n_blocks)
+        counts = np.zeros(n_blocks)
+
+        chunk = base_block * CHUNK_BLOCKS
+        for start in range(0, frames, chunk):
+            block = samples[start:start + chunk].astype(np.float64) * scale
+            starts = np.arange(0, len(block), base_block)
+            first = start // base_block
+            index = slice(first, first + len(starts))
+            mins[index] = np.minimum.reduceat(block, starts, axis=0).min(axis=1)
+            maxs[index] = np.maximum.reduceat(block, starts, axis=0).max(axis=1)
+            sumsq[index] = np.add.reduceat(block ** 2, starts, axis=0).sum(axis=1)
+            counts[index] = np.diff(np.append(starts, len(block))) * samples.shape[1]
+
+        levels = []
+        size = base_block
+        while True:
+            levels.append((size, cls._pack(mins, maxs, np.sqrt(sumsq / np.maximum(counts, 1)))))
+            if len(mins) <= 1:
+                break
+            groups = np.arange(0, len(mins), factor)
+            mins = np.minimum.reduceat(mins, groups)
+            maxs = np.maximum.reduceat(maxs, groups)
+            sumsq = np.add.reduceat(sumsq, groups)
+            counts = np.add.reduceat(counts, groups)
+            size *= factor
+
+        return cls(track.frame_rate, track.channels, frames, levels, factor)
+
+    @staticmethod
+    def _pack(mins, maxs, rms):
+        peaks = np.empty(len(mins), dtype=PEAK_DTYPE)
+        peaks['min'] = np.clip(np.floor(mins), -32768, 32767)
+        peaks['max'] = np.clip(np.ceil(maxs), -32768, 32767)
+        peaks['rms'] = np.clip(np.round(rms), 0, 32767)
+        return peaks
+
+    def write(self, path):
+        """Grava o índice em disco; retorna o tamanho em bytes"""
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, len(self.levels), self.factor, self.channels,
+                self.frame_rate, self.levels[0][0], self.frames
+            ))
+            for size, peaks in self.levels:
+                f.write(LEVEL_HEADER.pack(size, len(peaks)))
+                f.write(peaks.tobytes())
+            return f.tell()
+
+    @classmethod
+    def read(cls, path):
+        """Lê um índice gravado com write() (sem tocar no áudio)"""
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, n_levels, factor, channels, frame_rate, _, frames = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Arquivo de picos inválido: {path}")
+
+        levels = []
+        offset = HEADER.size
+        for _ in range(n_levels):
+            size, count = LEVEL_HEADER.unpack_from(data, offset)
+            offset += LEVEL_HEADER.size
+            peaks = np.frombuffer(data, dtype=PEAK_DTYPE, count=count, offset=offset)
+            offset += count * PEAK_DTYPE.itemsize
+            levels.append((size, peaks))
+        return cls(frame_rate, channels, frames, levels, factor)
+
+    @property
+    def duration_ms(self):
+        return self.frames * 1000 / self.frame_rate
+
+    def view(self, start_ms=0, end_ms=None, width=1000):
+        """
+        Picos de um trecho no nível de zoom adequado a uma largura em pixels
+
+        Escolhe o nível mais geral que ainda tem pelo menos um bloco por
+        pixel, então visão geral e zoom custam o mesmo.
+
+        Args:
+            start_ms: Início do trecho (ms)
+            end_ms: Fim do trecho (ms, padrão: fim da faixa)
+            width: Largura de desenho (pixels)
+
+        Returns:
+            Dict com 'block' (frames por ponto), 'start_frame' e os arrays
+            'min', 'max' e 'rms' (escala de 16 bits)
+        """
+        if end_ms is None:
+            end_ms = self.duration_ms
+        start = max(0, int(start_ms * self.frame_rate / 1000))
+        end = min(self.frames, max(start, int(end_ms * self.frame_rate / 1000)))
+        frames_per_pixel = (end - start) / max(1, width)
+
+        size, peaks = self.levels[0]
+        for level_size, level_peaks in self.levels:
+            if level_size > frames_per_pixel:
+                break
+            size, peaks = level_size, level_peaks
+
+        first = start // size
+        last = -(-end // size)
+        window = peaks[first:last]
+        return {
+            'block': size,
+            'start_frame': first * size,
+            'min': window['min'],
+            'max': window['max'],
+            'rms': window['rms'],
+        }
+
+
+def write_peak_index(track, path, base_block=BASE_BLOCK, factor=ZOOM_FACTOR):
+    """Calcula e grava o índice de picos de uma faixa; retorna o tamanho em bytes"""
+    return PeakIndex.from_track(track, base_block=base_block, factor=factor).write(path)
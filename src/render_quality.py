@@ -0,0 +1,43 @@
+"""
+Render Quality - Presets de qualidade de renderização
+Define taxa de amostragem, canais e se a masterização roda, para
+previews rápidos (draft) ou finais (final)
+"""
+
+
+class RenderQuality:
+    def __init__(self, name, sample_rate, channels=1, mastering=True):
+        """
+        Args:
+            name: Nome do preset
+            sample_rate: Taxa de amostragem (Hz)
+            channels: Número de canais
+            mastering: Aplicar normalização/compressão final
+        """
+        self.name = name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.mastering = mastering
+
+    def __repr__(self):
+        return f"RenderQuality({self.name!r}, sample_rate={self.sample_rate})"
+
+
+DRAFT = RenderQuality('draft', sample_rate=22050, channels=1, mastering=False)
+FINAL = RenderQuality('final', sample_rate=44100, channels=1, mastering=True)
+
+PRESETS = {
+    'draft': DRAFT,
+    'final': FINAL,
+}
+
+
+def get_quality(quality=None):
+    """Resolve um preset pelo nome ('draft', 'final') ou devolve o próprio objeto"""
+    if quality is None:
+        return FINAL
+    if isinstance(quality, RenderQuality):
+        return quality
+    if quality not in PRESETS:
+        raise ValueError(f"Qualidade desconhecida: {quality} (use {', '.join(PRESETS)})")
+    return PRESETS[quality]
@@ -0,0 +1,606 @@
+"""
+Render Server - Serviço local de renderização
+Servidor HTTP com fila limitada e pool de processos "quentes" que
+mantêm o MusicComposer carregado entre jobs; os samples ficam em memória
+compartilhada (uma cópia para todos os workers)
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from render_quality import PRESETS
+from sample_bank import SampleBank, attach_samples
+from peak_index import PEAK_EXTENSION
+
+
+STYLES = ('funk', 'pop')
+FORMATS = ('wav', 'mp3', 'ogg', 'flac')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+FINISHED = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+
+class QueueFullError(Exception):
+    """A fila de jobs está cheia (backpressure)"""
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_spec(spec):
+    """
+    Valida e completa a especificação de um render
+
+    Campos aceitos:
+        style: 'funk' ou 'pop'
+        tempo: BPM
+        duration_seconds: Duração da faixa simples
+        structure: True para a música estruturada (intro, verse, chorus...)
+        range: [início_ms, fim_ms] para renderizar só um trecho da estrutura
+        melody: {'notes': [...], 'durations': [...], 'start_time': ms}
+        format: 'wav', 'mp3', 'ogg' ou 'flac'
+        quality: 'draft' (preview rápido) ou 'final'
+        timeout: Tempo máximo do job em segundos
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("A especificação deve ser um objeto JSON")
+
+    spec = dict(spec)
+    spec.setdefault('style', 'pop')
+    spec.setdefault('tempo', 120)
+    spec.setdefault('duration_seconds', 20)
+    spec.setdefault('structure', False)
+    spec.setdefault('format', 'wav')
+    spec.setdefault('quality', 'final')
+
+    if spec['style'] not in STYLES:
+        raise ValueError(f"Estilo inválido: {spec['style']}")
+    if spec['quality'] not in PRESETS:
+        raise ValueError(f"Qualidade inválida: {spec['quality']}")
+    if spec['format'] not in FORMATS:
+        raise ValueError(f"Formato inválido: {spec['format']}")
+    for field in ('tempo', 'duration_seconds', 'timeout'):
+        if field in spec and not _is_number(spec[field]):
+            raise ValueError(f"{field} deve ser um número: {spec[field]!r}")
+    if not 40 <= spec['tempo'] <= 300:
+        raise ValueError(f"Tempo fora do intervalo (40-300): {spec['tempo']}")
+    if not 0 < spec['duration_seconds'] <= 600:
+        raise ValueError(f"Duração fora do intervalo (0-600s): {spec['duration_seconds']}")
+    if 'range' in spec:
+        bounds = spec['range']
+        if not (isinstance(bounds, list) and len(bounds) == 2 and all(map(_is_number, bounds))):
+            raise ValueError(f"Trecho deve ser [início_ms, fim_ms]: {bounds}")
+        start, end = bounds
+        if not 0 <= start < end:
+            raise ValueError(f"Trecho inválido: {bounds}")
+    if 'melody' in spec:
+        melody = spec['melody']
+        if not isinstance(melody, dict):
+            raise ValueError("A melodia deve ser um objeto com 'notes' e 'durations'")
+        notes = melody.get('notes', [])
+        durations = melody.get('durations', [])
+        for field, values in (('notes', notes), ('durations', durations)):
+            if not (isinstance(values, list) and all(map(_is_number, values))):
+                raise ValueError(f"melody.{field} deve ser uma lista de números")
+        if not _is_number(melody.get('start_time', 0)):
+            raise ValueError("melody.start_time deve ser um número")
+        if len(notes) != len(durations):
+            raise ValueError("A melodia precisa de uma duração por nota")
+    if 'timeout' in spec and spec['timeout'] <= 0:
+        raise ValueError(f"Timeout inválido: {spec['timeout']}")
+
+    return spec
+
+
+def render_spec(composer, spec, name):
+    """Renderiza uma especificação validada e exporta; retorna o caminho"""
+    composer.tempo = spec['tempo']
+    composer.beat_gen.tempo = spec['tempo']
+
+    if 'range' in spec:
+        start, end = spec['range']
+        track = composer.render_preview(start, end, style=spec['style'])
+    elif spec['structure']:
+        track = composer.create_song_structure(style=spec['style'])
+    else:
+        track = composer.build_audio_track(
+            style=spec['style'],
+            duration_seconds=spec['duration_seconds']
+        )
+
+    if 'melody' in spec:
+        melody = spec['melody']
+        track = composer.add_melody(
+            track,
+            melody['notes'],
+            melody['durations'],
+            start_time=melody.get('start_time', 0)
+        )
+
+    return composer.export_track(track, name, format=spec['format'])
+
+
+def _worker_main(conn, work_dir, samples_dir, sample_descriptors=None):
+    """Loop do processo worker: mantém o compositor e os samples carregados"""
+    from music_composer import MusicComposer
+
+    composers = {}
+    shared = attach_samples(sample_descriptors) if sample_descriptors else None
+
+    def composer_for(quality):
+        if quality not in composers:
+            composer = MusicComposer(quality=quality)
+            composer.output_dir = work_dir
+            if samples_dir:
+                composer.samples_dir = samples_dir
+            composer.shared_samples = shared
+            composer._load_samples()  # Aquecer: samples ficam em memória
+            composers[quality] = composer
+        return composers[quality]
+
+    composer_for('final')
+
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            job_id, spec = message
+            started = time.time()
+            try:
+                path = render_spec(composer_for(spec['quality']), spec, job_id)
+                conn.send((DONE, path, time.time() - started))
+            except Exception as e:
+                conn.send((FAILED, f"{type(e).__name__}: {e}", time.time() - started))
+    finally:
+        composers.clear()
+        if shared is not None:
+            shared.close()
+
+
+class RenderJob:
+    """Um pedido de render e seu estado"""
+
+    def __init__(self, spec, timeout):
+        self.id = uuid.uuid4().hex[:12]
+        self.spec = spec
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'spec': self.spec,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class _WorkerSlot:
+    """Um processo worker e a conexão com ele"""
+
+    def __init__(self, context, index, work_dir, samples_dir, sample_bank=None):
+        self.context = context
+        self.index = index
+        self.work_dir = work_dir
+        self.samples_dir = samples_dir
+        self.sample_bank = sample_bank
+        self.sample_descriptors = None
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        parent_conn, child_conn = self.context.Pipe()
+        if self.sample_bank is not None:
+            self.sample_descriptors = self.sample_bank.acquire()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.work_dir, self.samples_dir, self.sample_descriptors),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def restart(self):
+        """Mata o worker (job travado ou cancelado) e sobe um novo"""
+        self.kill()
+        self.conn.close()
+        self._release_samples()
+        self.start()
+
+    def kill(self):
+        """Mata o worker sem subir outro (stop() ainda fecha e libera)"""
+        self.process.terminate()
+        self.process.join(5)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+        self.conn.close()
+        self._release_samples()
+
+    def _release_samples(self):
+        """Devolve ao banco a referência do processo que parou"""
+        if self.sample_descriptors is not None:
+            self.sample_bank.release(self.sample_descriptors)
+            self.sample_descriptors = None
+
+
+class RenderService:
+    def __init__(self, output_dir, samples_dir=None, workers=2, max_queue=16,
+                 default_timeout=300, job_history=1000, share_samples=True):
+        """
+        Serviço de renderização com fila limitada e pool de workers
+
+        Args:
+            output_dir: Pasta onde os resultados são gravados
+            samples_dir: Pasta dos samples (padrão: a do MusicComposer)
+            workers: Número de processos worker
+            max_queue: Máximo de jobs esperando na fila
+            default_timeout: Timeout padrão por job (segundos)
+            job_history: Quantos jobs finalizados manter para consulta
+            share_samples: Publicar os samples uma vez em memória
+                compartilhada em vez de cada worker ler a sua cópia
+        """
+        self.output_dir = output_dir
+        self.samples_dir = samples_dir
+        self.default_timeout = default_timeout
+        self.job_history = job_history
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._started_at = time.time()
+        self._counters = {
+            'submitted': 0, 'rejected': 0, DONE: 0,
+            FAILED: 0, CANCELLED: 0, TIMEOUT: 0,
+        }
+        self._render_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._busy = 0
+
+        self.sample_bank = self._publish_samples() if share_samples else None
+
+        context = multiprocessing.get_context('spawn')
+        self._slots = [
+            _WorkerSlot(
+                context, i, os.path.join(output_dir, 'jobs', f'worker_{i}'),
+                samples_dir, self.sample_bank
+            )
+            for i in range(workers)
+        ]
+        self._threads = [
+            threading.Thread(target=self._run_slot, args=(slot,), daemon=True)
+            for slot in self._slots
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, spec):
+        """Enfileira um render; levanta QueueFullError se a fila estiver cheia"""
+        spec = validate_spec(spec)
+        job = RenderJob(spec, spec.get('timeout', self.default_timeout))
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counters['rejected'] += 1
+                raise QueueFullError(f"Fila cheia ({self._queue.maxsize} jobs)")
+            self._jobs[job.id] = job
+            self._counters['submitted'] += 1
+            self._prune_history()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancela um job na fila ou em execução; retorna o job ou None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+        return job
+
+    def metrics(self):
+        """Métricas de fila e throughput"""
+        with self._lock:
+            uptime = time.time() - self._started_at
+            finished = self._counters[DONE] + self._counters[FAILED]
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'workers': len(self._slots),
+                'busy_workers': self._busy,
+                'queue_depth': self._queue.qsize(),
+                'queue_limit': self._queue.maxsize,
+                'jobs': dict(self._counters),
+                'throughput_jobs_per_minute': round(self._counters[DONE] / uptime * 60, 3),
+                'avg_render_seconds': round(self._render_seconds / finished, 3) if finished else None,
+                'avg_queue_wait_seconds': round(self._wait_seconds / finished, 3) if finished else None,
+                'shared_samples': self.sample_bank.stats() if self.sample_bank else None,
+            }
+
+    def shutdown(self):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        for slot in self._slots:
+            slot.stop()
+        if self.sample_bank is not None:
+            self.sample_bank.close()
+
+    def _publish_samples(self):
+        """Decodifica a pasta de samples uma vez e publica em memória compartilhada"""
+        from music_composer import MusicComposer
+
+        composer = MusicComposer()
+        if self.samples_dir:
+            composer.samples_dir = self.samples_dir
+        composer._ensure_samples()
+
+        bank = SampleBank()
+        published = bank.publish_dir(composer.samples_dir)
+        print(f"🥁 {len(published)} samples em memória compartilhada "
+              f"({bank.stats()['bytes'] / 1024:.0f} KB)")
+        return bank
+
+    def _finish(self, job, status, result=None, error=None):
+        """Marca o job como finalizado (chamar com o lock)"""
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        self._counters[status] += 1
+
+    def _prune_history(self):
+        """Descarta os jobs finalizados mais antigos (chamar com o lock)"""
+        finished = [job for job in self._jobs.values() if job.status in FINISHED]
+        for job in finished[:max(0, len(finished) - self.job_history)]:
+            del self._jobs[job.id]
+
+    def _run_slot(self, slot):
+        """Thread que alimenta um worker com jobs da fila"""
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                if job.status != QUEUED:
+                    continue  # Cancelado enquanto esperava
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._busy += 1
+
+            try:
+                self._run_job(slot, job)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def _run_job(self, slot, job):
+        try:
+            slot.conn.send((job.id, job.spec))
+        except (BrokenPipeError, OSError):
+            with self._lock:
+                self._finish(job, FAILED, error="Worker encerrado")
+            slot.restart()
+            return
+        deadline = job.started_at + job.timeout
+
+        while True:
+            try:
+                ready = slot.conn.poll(0.1)
+            except (EOFError, OSError):
+                ready = False
+            if ready:
+                try:
+                    status, payload, elapsed = slot.conn.recv()
+                except (EOFError, OSError):
+                    status, payload, elapsed = FAILED, "Worker encerrado", time.time() - job.started_at
+                with self._lock:
+                    self._render_seconds += elapsed
+                    self._wait_seconds += job.started_at - job.submitted_at
+                    if status == DONE:
+                        self._finish(job, DONE, result=payload)
+                    else:
+                        self._finish(job, FAILED, error=payload)
+                if status != DONE and not slot.process.is_alive():
+                    self._recycle(slot)
+                return
+
+            if not slot.process.is_alive():
+                with self._lock:
+                    self._finish(job, FAILED, error="Worker encerrado")
+                self._recycle(slot)
+                return
+
+            if job.cancel_requested or time.time() > deadline or self._stopping.is_set():
+                self._recycle(slot)
+                with self._lock:
+                    if job.cancel_requested or self._stopping.is_set():
+                        self._finish(job, CANCELLED)
+                    else:
+                        self._finish(job, TIMEOUT, error=f"Excedeu {job.timeout}s")
+                return
+
+    def _recycle(self, slot):
+        """Troca o worker de um slot; no shutdown só o mata (sem subir outro)"""
+        if self._stopping.is_set():
+            slot.kill()
+        else:
+            slot.restart()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Rotas:
+        POST   /jobs              -> enfileira (202) ou fila cheia (429)
+        GET    /jobs/<id>         -> estado do job
+        GET    /jobs/<id>/result  -> arquivo renderizado
+        GET    /jobs/<id>/peaks   -> índice de picos da forma de onda
+        DELETE /jobs/<id>         -> cancela
+        GET    /metrics           -> métricas
+    """
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        return parts
+
+    def do_POST(self):
+        if self._route() != ['jobs']:
+            return self._send_json(404, {'error': 'Rota não encontrada'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            spec = json.loads(self.rfile.read(length) or b'{}')
+            job = self.service.submit(spec)
+        except QueueFullError as e:
+            return self._send_json(429, {'error': str(e)})
+        except (ValueError, TypeError, KeyError) as e:
+            return self._send_json(400, {'error': str(e)})
+        self._send_json(202, job.to_dict())
+
+    def do_GET(self):
+        parts = self._route()
+        if parts == ['metrics']:
+            return self._send_json(200, self.service.metrics())
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {'error': 'Job não encontrado'})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2] == 'result':
+                return self._send_result(job)
+            if parts[2] == 'peaks':
+                return self._send_peaks(job)
+        self._send_json(404, {'error': 'Rota não encontrada'})
+
+    def do_DELETE(self):
+        parts = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self._send_json(404, {'error': 'Rota não encontrada'})
+        job = self.service.cancel(parts[1])
+        if job is None:
+            return self._send_json(404, {'error': 'Job não encontrado'})
+        self._send_json(200, job.to_dict())
+
+    def _send_result(self, job):
+        if job.status != DONE:
+            return self._send_json(409, {'error': f"Job não concluído ({job.status})"})
+        with open(job.result, 'rb') as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', f"audio/{job.spec['format']}")
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(job.result)}"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_peaks(self, job):
+        if job.status != DONE:
+            return self._send_json(409, {'error': f"Job não concluído ({job.status})"})
+        path = f"{os.path.splitext(job.result)[0]}.{PEAK_EXTENSION}"
+        if not os.path.exists(path):
+            return self._send_json(404, {'error': 'Índice de picos não encontrado'})
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(service, host='127.0.0.1', port=8765):
+    """Cria o servidor HTTP ligado a um RenderService"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service
+    return server
+
+
+def main():
+    """Sobe o servidor local de renderização"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Servidor local de renderização")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--max-queue', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    service = RenderService(
+        output_dir=os.path.join(base_dir, 'output'),
+        samples_dir=os.path.join(base_dir, 'samples'),
+        workers=args.workers,
+        max_queue=args.max_queue,
+        default_timeout=args.timeout
+    )
+    server = create_server(service, args.host, args.port)
+
+    print(f"🎛️  Render server em http://{args.host}:{args.port}")
+    print(f"   {args.workers} workers, fila de até {args.max_queue} jobs")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️  Encerrando...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
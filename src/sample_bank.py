@@ -0,0 +1,234 @@
+"""
+Sample Bank - Banco de samples em memória compartilhada
+Publica o PCM decodificado dos samples uma única vez em segmentos de
+multiprocessing.shared_memory; os workers se ligam por nome, só leitura
+"""
+
+from multiprocessing import shared_memory
+import os
+import threading
+import numpy as np
+from pydub import AudioSegment
+from audio_buffer import SAMPLE_DTYPES
+
+
+SAMPLE_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.flac')
+
+
+def _attach(name):
+    """Liga a um segmento existente sem registrá-lo para remoção neste processo"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Versões antigas: processos filhos (spawn) usam o resource tracker
+        # do dono, então registrar de novo não muda quem remove o segmento
+        return shared_memory.SharedMemory(name=name)
+
+
+class _Entry:
+    """Um sample publicado e quantos donos ainda o usam"""
+
+    def __init__(self, shm, descriptor):
+        self.shm = shm
+        self.descriptor = descriptor
+        self.refs = 1  # Referência do próprio banco
+
+
+class SampleBank:
+    def __init__(self):
+        """
+        Banco de samples do processo dono (ex.: o RenderService)
+
+        Cada sample vive em um segmento compartilhado com contagem de
+        referências: o banco tem uma e cada acquire() soma uma. O segmento
+        é removido quando a última referência é liberada.
+        """
+        self._entries = {}   # nome -> _Entry publicado agora
+        self._retired = []   # Versões substituídas ainda em uso
+        self._lock = threading.Lock()
+
+    def publish(self, name, segment):
+        """
+        Copia o PCM de um AudioSegment para um segmento compartilhado
+
+        Args:
+            name: Nome do sample (ex.: 'kick_808.wav')
+            segment: AudioSegment decodificado
+
+        Returns:
+            Descritor do sample (picklable)
+        """
+        data = segment.raw_data
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        shm.buf[:len(data)] = data
+        descriptor = {
+            'shm': shm.name,
+            'bytes': len(data),
+            'frame_rate': segment.frame_rate,
+            'channels': segment.channels,
+            'sample_width': segment.sample_width,
+        }
+
+        with self._lock:
+            previous = self._entries.get(name)
+            self._entries[name] = _Entry(shm, descriptor)
+            if previous is not None:
+                self._retired.append(previous)
+                self._release_entry(previous)
+        return descriptor
+
+    def publish_dir(self, samples_dir, extensions=SAMPLE_EXTENSIONS):
+        """
+        Publica todos os samples de uma pasta (bateria e samples do usuário)
+
+        Returns:
+            Lista com os nomes publicados
+        """
+        published = []
+        for filename in sorted(os.listdir(samples_dir)):
+            if not filename.lower().endswith(extensions):
+                continue
+            path = os.path.join(samples_dir, filename)
+            try:
+                segment = AudioSegment.from_file(path)
+            except Exception as e:
+                print(f"⚠️  Sample ignorado ({filename}): {e}")
+                continue
+            self.publish(filename, segment)
+            published.append(filename)
+        return published
+
+    def acquire(self):
+        """
+        Referência para todos os samples publicados agora
+
+        Returns:
+            Dict nome -> descritor, para passar a attach_samples() em
+            outro processo e depois devolver com release()
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                entry.refs += 1
+            return {name: entry.descriptor for name, entry in self._entries.items()}
+
+    def release(self, descriptors):
+        """Devolve uma referência obtida com acquire()"""
+        with self._lock:
+            shm_names = {descriptor['shm'] for descriptor in descriptors.values()}
+            for entry in list(self._entries.values()) + self._retired:
+                if entry.descriptor['shm'] in shm_names:
+                    self._release_entry(entry)
+
+    def _release_entry(self, entry):
+        """Solta uma referência; remove o segmento na última (chamar com o lock)"""
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+        entry.shm.close()
+        entry.shm.unlink()
+        if entry in self._retired:
+            self._retired.remove(entry)
+
+    def stats(self):
+        """Samples publicados, bytes compartilhados e referências"""
+        with self._lock:
+            return {
+                'samples': len(self._entries),
+                'bytes': sum(e.descriptor['bytes'] for e in self._entries.values()),
+                'refs': {name: e.refs for name, e in self._entries.items()},
+                'retired': len(self._retired),
+            }
+
+    def close(self):
+        """Remove todos os segmentos (os processos ligados devem ter parado)"""
+        with self._lock:
+            for entry in list(self._entries.values()) + self._retired:
+                if entry.refs > 0:
+                    entry.shm.close()
+                    entry.shm.unlink()
+                    entry.refs = 0
+            self._entries.clear()
+            self._retired.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedSamples:
+    def __init__(self, descriptors):
+        """
+        Samples de um SampleBank vistos de outro processo (só leitura)
+
+        Os dados ficam expostos como arrays NumPy somente leitura que
+        apontam direto para a memória compartilhada, então N workers ocupam
+        uma única cópia do banco de samples. O pydub não aceita memoryview
+        como dados (+, * e pickle falham), então segment() devolve uma
+        cópia em bytes, um AudioSegment normal.
+
+        Args:
+            descriptors: Dict vindo de SampleBank.acquire()
+        """
+        self._handles = []
+        self.descriptors = {}
+        self.arrays = {}
+        for name, descriptor in descriptors.items():
+            shm = _attach(descriptor['shm'])
+            self._handles.append(shm)
+            self.descriptors[name] = descriptor
+            self.arrays[name] = self._view(shm, descriptor)
+
+    @staticmethod
+    def _view(shm, descriptor):
+        """Array (frames,) ou (frames, canais) sobre o segmento, sem cópia"""
+        samples = np.frombuffer(
+            shm.buf, dtype=SAMPLE_DTYPES[descriptor['sample_width']],
+            count=descriptor['bytes'] // descriptor['sample_width']
+        )
+        samples.flags.writeable = False
+        if descriptor['channels'] > 1:
+            return samples.reshape(-1, descriptor['channels'])
+        return samples
+
+    def array(self, name):
+        """Amostras do sample como array somente leitura (sem cópia)"""
+        return self.arrays[name]
+
+    def segment(self, name):
+        """Cópia do sample como AudioSegment (pode concatenar, repetir, etc.)"""
+        descriptor = self.descriptors[name]
+        return AudioSegment(
+            self.arrays[name].tobytes(),
+            frame_rate=descriptor['frame_rate'],
+            sample_width=descriptor['sample_width'],
+            channels=descriptor['channels']
+        )
+
+    def get(self, name):
+        return self.segment(name) if name in self.arrays else None
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def __getitem__(self, name):
+        return self.segment(name)
+
+    def close(self):
+        """
+        Solta os segmentos neste processo
+
+        Os arrays devolvidos por array() deixam de valer: quem ainda os
+        usa deve copiá-los antes.
+        """
+        self.arrays.clear()
+        self.descriptors.clear()
+        for shm in self._handles:
+            shm.close()
+        self._handles = []
+
+
+def attach_samples(descriptors):
+    """Liga aos samples publicados por um SampleBank (ver SharedSamples)"""
+    return SharedSamples(descriptors)
@@ -0,0 +1,121 @@
+"""
+Sidechain - Ducking guiado pelos eventos de kick
+Gera a curva de ganho do "pumping" direto dos instantes dos kicks (sem
+detector/compressor) e aplica nas camadas com uma única multiplicação
+"""
+
+import numpy as np
+from beat_generator import BeatGenerator
+from audio_buffer import as_float, from_float
+
+
+def ducking_envelope(kick_frames, start, frames, depth_db=-6, attack=1, release=1):
+    """
+    Curva de ganho do sidechain (vetorizada)
+
+    Cada kick abaixa o ganho até depth_db em 'attack' frames e o devolve
+    a 1.0 em 'release' frames. Quando um kick chega antes do anterior
+    terminar o release, vale o maior ducking dos dois (sem saltos).
+
+    Args:
+        kick_frames: Instantes dos kicks em frames (ordenados)
+        start: Frame inicial do trecho
+        frames: Número de frames do trecho
+        depth_db: Redução máxima de ganho (dB, negativo)
+        attack: Frames até a redução máxima
+        release: Frames de volta ao ganho unitário
+
+    Returns:
+        Array float64 (frames,) com o ganho de cada frame
+    """
+    kick_frames = np.asarray(kick_frames, dtype=np.int64)
+    if len(kick_frames) == 0 or frames <= 0:
+        return np.ones(max(0, frames))
+
+    n = np.arange(start, start + frames)
+    last = np.searchsorted(kick_frames, n, side='right') - 1
+
+    def amount(index):
+        # Quanto do ducking total está ativo, 0..1, para o kick 'index'
+        t = (n - kick_frames[np.maximum(index, 0)]).astype(np.float64)
+        rise = np.minimum(t / attack, 1.0)
+        fall = np.clip(1.0 - (t - attack) / release, 0.0, 1.0)
+        return np.where(index >= 0, np.where(t < attack, rise, fall ** 2), 0.0)
+
+    duck = np.maximum(amount(last), amount(last - 1))
+    return 1.0 - (1.0 - 10 ** (depth_db / 20)) * duck
+
+
+class Sidechain:
+    def __init__(self, kick_times_ms=None, style='funk', tempo=120,
+                 depth_db=-6, attack_ms=5, release_ms=180):
+        """
+        Sidechain a partir de kicks conhecidos
+
+        Args:
+            kick_times_ms: Instantes dos kicks (ms); padrão: padrão do estilo
+            style: 'funk' ou 'pop' (usado quando kick_times_ms é None)
+            tempo: BPM do padrão
+            depth_db: Redução máxima de ganho no kick (dB)
+            attack_ms: Tempo até a redução máxima
+            release_ms: Tempo de volta ao ganho unitário
+        """
+        self.kick_times_ms = None if kick_times_ms is None else sorted(kick_times_ms)
+        self.style = style
+        self.tempo = tempo
+        self.depth_db = depth_db
+        self.attack_ms = attack_ms
+        self.release_ms = release_ms
+
+    def kick_times(self, end_ms, tempo=None):
+        """Instantes dos kicks (ms) até end_ms (tempo: BPM atual do padrão)"""
+        if self.kick_times_ms is not None:
+            return self.kick_times_ms
+        return BeatGenerator.kick_times(self.style, tempo or self.tempo, end_ms)
+
+    def envelope(self, position_ms, frames, frame_rate, kick_times_ms=None, tempo=None):
+        """
+        Curva de ganho para um trecho que começa em position_ms
+
+        Args:
+            position_ms: Onde o trecho entra na faixa (ms)
+            frames: Número de frames do trecho
+            frame_rate: Taxa de amostragem
+            kick_times_ms: Kicks reais da faixa (ms); padrão: kick_times()
+            tempo: BPM para o padrão do estilo (quando não há kicks reais)
+        """
+        if kick_times_ms is None:
+            kick_times_ms = self.kick_times(position_ms + frames * 1000 / frame_rate, tempo)
+        kicks = np.asarray(sorted(kick_times_ms), dtype=np.float64)
+        return ducking_envelope(
+            (kicks * frame_rate / 1000).astype(np.int64),
+            int(position_ms * frame_rate / 1000),
+            frames,
+            depth_db=self.depth_db,
+            attack=max(1, int(self.attack_ms * frame_rate / 1000)),
+            release=max(1, int(self.release_ms * frame_rate / 1000))
+        )
+
+    def apply(self, segment, position_ms=0, kick_times_ms=None, tempo=None):
+        """
+        Aplica o ducking em uma camada
+
+        Args:
+            segment: AudioSegment da camada (baixo, melodia, vocal...)
+            position_ms: Onde a camada entra na faixa (ms)
+            kick_times_ms: Kicks reais da faixa (ms); padrão: kick_times()
+            tempo: BPM para o padrão do estilo (quando não há kicks reais)
+        """
+        samples = as_float(segment)
+        gain = self.envelope(
+            position_ms, len(samples), segment.frame_rate,
+            kick_times_ms=kick_times_ms, tempo=tempo
+        )
+        if samples.ndim > 1:
+            gain = gain[:, None]
+        return from_float(
+            samples * gain,
+            segment.frame_rate,
+            sample_width=segment.sample_width,
+            scale=segment.max_possible_amplitude
+        )
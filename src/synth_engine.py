@@ -0,0 +1,164 @@
+"""
+Synth Engine - Sintetizador polifônico
+Pool fixo de vozes com roubo de voz, osciladores e envelopes ADSR
+vetorizados por voz, renderizado em blocos
+"""
+
+import bisect
+import numpy as np
+from audio_buffer import from_float
+
+
+WAVEFORMS = ('sine', 'saw', 'square', 'triangle')
+
+STEAL_FADE_MS = 5  # Fade rápido da nota roubada (evita clique)
+
+
+def midi_to_hz(notes):
+    """Converte notas MIDI (escalar ou array) para Hz"""
+    return 440.0 * (2.0 ** ((np.asarray(notes, dtype=np.float64) - 69) / 12.0))
+
+
+def oscillator(waveform, cycles):
+    """Forma de onda avaliada na fase dada em ciclos (vetorizado)"""
+    frac = cycles - np.floor(cycles)
+    if waveform == 'sine':
+        return np.sin(2 * np.pi * cycles)
+    if waveform == 'saw':
+        return 2.0 * frac - 1.0
+    if waveform == 'square':
+        return np.where(frac < 0.5, 1.0, -1.0)
+    if waveform == 'triangle':
+        return 4.0 * np.abs(frac - 0.5) - 1.0
+    raise ValueError(f"Forma de onda desconhecida: {waveform}")
+
+
+class PolySynth:
+    def __init__(self, frame_rate=44100, voices=8, waveform='saw', attack_ms=10,
+                 decay_ms=120, sustain=0.7, release_ms=150, gain_db=-12, block_ms=50):
+        """
+        Sintetizador polifônico com pool fixo de vozes
+
+        Args:
+            frame_rate: Taxa de amostragem
+            voices: Número máximo de notas simultâneas
+            waveform: 'sine', 'saw', 'square' ou 'triangle'
+            attack_ms, decay_ms, sustain, release_ms: Envelope ADSR
+            gain_db: Ganho de saída (por voz)
+            block_ms: Tamanho do bloco de renderização
+        """
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Forma de onda desconhecida: {waveform}")
+        self.frame_rate = frame_rate
+        self.voices = voices
+        self.waveform = waveform
+        self.attack = max(1, int(frame_rate * attack_ms / 1000))
+        self.decay = max(1, int(frame_rate * decay_ms / 1000))
+        self.sustain = sustain
+        self.release = max(1, int(frame_rate * release_ms / 1000))
+        self.gain = 10 ** (gain_db / 20)
+        self.block = max(1, int(frame_rate * block_ms / 1000))
+        self.steal_fade = max(1, int(frame_rate * STEAL_FADE_MS / 1000))
+
+    def _frames(self, ms):
+        return int(ms * self.frame_rate / 1000)
+
+    def allocate(self, events):
+        """
+        Distribui as notas no pool de vozes, roubando quando necessário
+
+        Args:
+            events: Lista de (início_ms, duração_ms, nota_midi, velocity)
+
+        Returns:
+            Arrays (start, off, cut, end, note, velocity) ordenados pelo início.
+            Tempos em frames; 'cut' é onde a nota foi roubada (ou nunca) e
+            'end' é onde ela para de soar.
+        """
+        events = sorted(events, key=lambda e: e[0])
+        n = len(events)
+        start = np.array([self._frames(e[0]) for e in events], dtype=np.int64)
+        off = start + np.array([max(1, self._frames(e[1])) for e in events], dtype=np.int64)
+        end = off + self.release
+        cut = np.full(n, np.iinfo(np.int64).max // 2, dtype=np.int64)
+        note = np.array([e[2] for e in events], dtype=np.float64)
+        velocity = np.array([e[3] for e in events], dtype=np.float64) / 127.0
+
+        # voice_note[v] = índice da nota que ocupa a voz v (-1 = livre)
+        voice_note = np.full(self.voices, -1, dtype=np.int64)
+        for i in range(n):
+            playing = voice_note >= 0
+            busy = playing.copy()
+            busy[playing] = end[voice_note[playing]] > start[i]
+            if not busy.all():
+                voice = int(np.argmin(busy))
+            else:
+                # Roubar: preferir notas já em release, depois a mais antiga
+                current = voice_note
+                releasing = off[current] <= start[i]
+                candidates = np.flatnonzero(releasing) if releasing.any() else np.arange(self.voices)
+                voice = int(candidates[np.argmin(start[current[candidates]])])
+                stolen = current[voice]
+                cut[stolen] = start[i]
+                end[stolen] = min(end[stolen], start[i] + self.steal_fade)
+            voice_note[voice] = i
+
+        return start, off, cut, end, note, velocity
+
+    def _envelope(self, t, length, cut):
+        """
+        Envelope ADSR (forma fechada) para uma matriz de tempos
+
+        Args:
+            t: Frames desde o note-on, (notas, bloco)
+            length: Frames até o note-off, (notas, 1)
+            cut: Frames até o corte por roubo, (notas, 1)
+        """
+        def held(x):
+            attack = x / self.attack
+            decay = 1.0 - (1.0 - self.sustain) * (x - self.attack) / self.decay
+            return np.where(x < self.attack, attack,
+                            np.where(x < self.attack + self.decay, decay, self.sustain))
+
+        level_at_off = held(length.astype(np.float64))
+        release = level_at_off * (1.0 - (t - length) / self.release)
+        env = np.where(t < length, held(t), release)
+        env *= np.clip(1.0 - (t - cut) / self.steal_fade, 0.0, 1.0)
+        return np.clip(env, 0.0, 1.0) * (t >= 0)
+
+    def render(self, events, length_ms=None):
+        """
+        Renderiza as notas em blocos
+
+        Args:
+            events: Lista de (início_ms, duração_ms, nota_midi, velocity)
+            length_ms: Duração total (padrão: até o fim da última nota)
+
+        Returns:
+            AudioSegment mono 16-bit
+        """
+        start, off, cut, end, note, velocity = self.allocate(events)
+        total = self._frames(length_ms) if length_ms is not None else int(end.max()) if len(end) else 0
+        output = np.zeros(total, dtype=np.float64)
+        freq = midi_to_hz(note) / self.frame_rate  # ciclos por frame
+
+        # Notas ordenadas pelo início; a maior duração limita a busca para trás
+        longest = int((end - start).max()) if len(start) else 0
+        starts_list = start.tolist()
+
+        for block_start in range(0, total, self.block):
+            block_end = min(block_start + self.block, total)
+            first = bisect.bisect_left(starts_list, block_start - longest)
+            last = bisect.bisect_left(starts_list, block_end)
+            active = np.arange(first, last)
+            active = active[end[active] > block_start]
+            if len(active) == 0:
+                continue
+
+            # Matriz (notas ativas, frames do bloco)
+            t = np.arange(block_start, block_end)[None, :] - start[active, None]
+            env = self._envelope(t, (off - start)[active, None], (cut - start)[active, None])
+            wave = oscillator(self.waveform, freq[active, None] * t)
+            output[block_start:block_end] = np.sum(wave * env * velocity[active, None], axis=0)
+
+        return from_float(output, self.frame_rate, scale=self.gain * 32767)
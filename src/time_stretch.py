@@ -0,0 +1,209 @@
+"""
+Time Stretch - Mudança de duração sem mudar o tom (WSOLA)
+Encaixa frases vocais em um número de beats/compassos; funciona em
+streaming, bloco a bloco, com busca e overlap-add vetorizados em NumPy
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from audio_buffer import as_float, from_float
+
+
+class TimeStretcher:
+    def __init__(self, frame_rate, ratio, channels=1, frame_ms=40, tolerance_ms=10):
+        """
+        Time-stretch WSOLA (waveform similarity overlap-add) em streaming
+
+        Cada janela de saída é copiada da entrada na posição nominal
+        (tempo de saída / ratio), ajustada dentro de ±tolerance_ms para a
+        posição mais parecida com a continuação natural da janela anterior,
+        então a forma de onda (e o tom) é preservada.
+
+        Args:
+            frame_rate: Taxa de amostragem
+            ratio: Duração de saída / duração de entrada (>1 alonga)
+            channels: Número de canais
+            frame_ms: Tamanho da janela (voz: 30-50 ms)
+            tolerance_ms: Deslocamento máximo da busca de similaridade
+        """
+        if ratio <= 0:
+            raise ValueError(f"Razão de stretch inválida: {ratio}")
+        self.frame_rate = frame_rate
+        self.ratio = ratio
+        self.channels = channels
+        self.frame = max(4, int(frame_rate * frame_ms / 1000) // 2 * 2)
+        self.hop = self.frame // 2  # Hop de síntese (Hann com 50% de overlap soma 1)
+        self.analysis_hop = self.hop / ratio
+        self.tolerance = max(1, int(frame_rate * tolerance_ms / 1000))
+        self.window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)
+
+        # Entrada com 'hop' zeros na frente, para a primeira janela não fazer
+        # fade-in; a saída correspondente (hop * ratio) é descartada
+        self._input = np.zeros((self.hop, channels))
+        self._input_start = 0          # Índice absoluto de _input[0]
+        self._received = 0             # Amostras reais recebidas
+        self._k = 0                    # Próxima janela de saída
+        self._prev = None              # Posição de entrada da janela anterior
+        self._out = np.zeros((0, channels))
+        self._out_start = 0            # Índice absoluto de _out[0]
+        self._drop = int(round(self.hop * ratio))
+
+    def _select(self, limit, last_k=None):
+        """
+        Escolhe a posição de entrada de cada janela possível
+
+        Args:
+            limit: Índice absoluto até onde há entrada disponível
+            last_k: Não passar desta janela (usado no flush)
+
+        Returns:
+            (primeira janela, array de posições absolutas)
+        """
+        n, tol, start = self.frame, self.tolerance, self._input_start
+        mono = self._input.mean(axis=1)
+        first_k = self._k
+        positions = []
+
+        while last_k is None or self._k < last_k:
+            nominal = int(round(self._k * self.analysis_hop))
+            if nominal + tol + n > limit:
+                break
+            if self._prev is None:
+                position = nominal
+            else:
+                natural = self._prev + self.hop
+                if natural + n > limit:
+                    break
+                low = max(start, nominal - tol)
+                candidates = sliding_window_view(mono[low - start:nominal + tol + n - start], n)
+                template = mono[natural - start:natural + n - start]
+                position = low + int(np.argmax(candidates @ template))
+            positions.append(position)
+            self._prev = position
+            self._k += 1
+
+        return first_k, np.asarray(positions, dtype=np.int64)
+
+    def _overlap_add(self, first_k, positions):
+        """Soma as janelas escolhidas no acumulador de saída (vetorizado)"""
+        m = len(positions)
+        if m == 0:
+            return
+        index = positions[:, None] - self._input_start + np.arange(self.frame)
+        frames = self._input[index] * self.window[None, :, None]  # (m, frame, canais)
+
+        # Janelas consecutivas se sobrepõem em meia janela
+        halves = np.zeros((m + 1, self.hop, self.channels))
+        halves[:m] += frames[:, :self.hop]
+        halves[1:] += frames[:, self.hop:]
+        added = halves.reshape(-1, self.channels)
+
+        offset = first_k * self.hop - self._out_start
+        needed = offset + len(added)
+        if needed > len(self._out):
+            self._out = np.concatenate((self._out, np.zeros((needed - len(self._out), self.channels))))
+        self._out[offset:needed] += added
+
+    def _emit(self, end):
+        """Devolve a saída pronta até o índice absoluto 'end'"""
+        # Nunca passar da duração da entrada já recebida: o que sai não
+        # volta, e ao comprimir muito as janelas andam à frente do total
+        end = min(end, self._drop + int(round(self._received * self.ratio)))
+        ready = max(0, end - self._out_start)
+        output = self._out[:ready]
+        self._out = self._out[ready:]
+        self._out_start += len(output)
+
+        # Descartar a saída das amostras de padding iniciais
+        skip = max(0, min(len(output), self._drop - (self._out_start - len(output))))
+        return output[skip:]
+
+    def _trim_input(self):
+        """Descarta a entrada que nenhuma janela futura pode usar"""
+        keep_from = int(round(self._k * self.analysis_hop)) - self.tolerance
+        if self._prev is not None:
+            keep_from = min(keep_from, self._prev + self.hop)
+        cut = max(0, keep_from - self._input_start)
+        if cut:
+            self._input = self._input[cut:]
+            self._input_start += cut
+
+    def process(self, samples):
+        """
+        Alimenta um bloco de entrada
+
+        Args:
+            samples: Array float (frames,) ou (frames, canais)
+
+        Returns:
+            Array float (frames, canais) com a saída já finalizada
+        """
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, self.channels)
+        self._input = np.concatenate((self._input, samples))
+        self._received += len(samples)
+
+        first_k, positions = self._select(self._input_start + len(self._input))
+        self._overlap_add(first_k, positions)
+        self._trim_input()
+        return self._emit(self._k * self.hop)
+
+    def flush(self):
+        """Termina o stream; devolve o restante até a duração exata"""
+        total = self._drop + int(round(self._received * self.ratio))
+        last_k = max(self._k, math.ceil(total / self.hop))
+
+        # Completar com silêncio o que as últimas janelas ainda leem
+        needed = int(round(last_k * self.analysis_hop)) + self.tolerance + 2 * self.frame
+        missing = needed - (self._input_start + len(self._input))
+        if missing > 0:
+            self._input = np.concatenate((self._input, np.zeros((missing, self.channels))))
+
+        first_k, positions = self._select(self._input_start + len(self._input), last_k=last_k)
+        self._overlap_add(first_k, positions)
+        return self._emit(total)
+
+
+def stretch(samples, frame_rate, ratio, **kwargs):
+    """
+    Time-stretch de um array inteiro (ver TimeStretcher)
+
+    Args:
+        samples: Array float (frames,) ou (frames, canais)
+        frame_rate: Taxa de amostragem
+        ratio: Duração de saída / duração de entrada
+
+    Returns:
+        Array com exatamente round(len(samples) * ratio) frames
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    stretcher = TimeStretcher(frame_rate, ratio, channels=channels, **kwargs)
+    output = np.concatenate((stretcher.process(samples), stretcher.flush()))
+
+    target = int(round(len(samples) * ratio))
+    if len(output) < target:
+        output = np.concatenate((output, np.zeros((target - len(output), channels))))
+    output = output[:target]
+    return output[:, 0] if samples.ndim == 1 else output
+
+
+def fit_to_duration(segment, duration_ms, **kwargs):
+    """
+    Estica/comprime um AudioSegment para a duração pedida, sem mudar o tom
+
+    Args:
+        segment: AudioSegment de origem
+        duration_ms: Duração desejada (ms)
+    """
+    if len(segment) == 0:
+        raise ValueError("Não é possível esticar um áudio vazio")
+    samples = as_float(segment)
+    ratio = (duration_ms * segment.frame_rate / 1000) / len(samples)
+    output = stretch(samples, segment.frame_rate, ratio, **kwargs)
+    return from_float(
+        output,
+        segment.frame_rate,
+        sample_width=segment.sample_width,
+        scale=segment.max_possible_amplitude
+    )
@@ -0,0 +1,143 @@
+"""
+Vocal Chop Engine - Motor vetorizado de vocal chops
+Fatia o vocal em janelas NumPy, aplica fades de uma vez só e posiciona
+os chops no grid de tempo em um único buffer de mixagem
+"""
+
+import numpy as np
+from audio_buffer import as_array, from_float
+
+
+class VocalChopEngine:
+    def __init__(self, audio):
+        """
+        Args:
+            audio: AudioSegment com o vocal de origem
+        """
+        audio = audio.set_channels(1).set_sample_width(2)
+        self.frame_rate = audio.frame_rate
+        self.samples = as_array(audio).astype(np.float32)
+
+    def _frames(self, ms):
+        return int(ms * self.frame_rate / 1000)
+
+    def fixed_starts(self, chop_ms, count):
+        """Inícios (em frames) de chops consecutivos de tamanho fixo, em loop"""
+        step = max(1, min(self._frames(chop_ms), len(self.samples)))
+        return (np.arange(count) * step) % max(1, len(self.samples))
+
+    def detect_onsets(self, hop_ms=10, sensitivity=1.5, min_gap_ms=80):
+        """
+        Detecta ataques (onsets) pelo aumento de energia entre janelas
+
+        Args:
+            hop_ms: Tamanho da janela de análise
+            sensitivity: Desvios-padrão acima da média para contar como ataque
+            min_gap_ms: Distância mínima entre dois onsets
+
+        Returns:
+            Array com os inícios dos onsets em frames
+        """
+        hop = max(1, self._frames(hop_ms))
+        n = len(self.samples) // hop
+        if n < 2:
+            return np.zeros(1, dtype=np.int64)
+
+        frames = self.samples[:n * hop].reshape(n, hop)
+        energy = np.log1p(np.sqrt(np.mean(frames ** 2, axis=1)))
+        flux = np.maximum(np.diff(energy, prepend=energy[0]), 0)
+
+        threshold = flux.mean() + sensitivity * flux.std()
+        is_peak = (flux > threshold) & (flux >= np.roll(flux, 1)) & (flux >= np.roll(flux, -1))
+        candidates = np.flatnonzero(is_peak)
+
+        # Respeitar distância mínima (mantém o primeiro de cada grupo)
+        min_gap = max(1, int(min_gap_ms / hop_ms))
+        if len(candidates):
+            keep = np.concatenate(([True], np.diff(candidates) >= min_gap))
+            candidates = candidates[keep]
+
+        if len(candidates) == 0 or candidates[0] != 0:
+            candidates = np.concatenate(([0], candidates))
+        return candidates * hop
+
+    def slice(self, starts, chop_ms, fade_ms=10):
+        """
+        Extrai os chops como uma matriz (n_chops, frames) com fades aplicados
+
+        Args:
+            starts: Inícios dos chops em frames
+            chop_ms: Duração de cada chop
+            fade_ms: Fade in/out de cada chop
+        """
+        length = max(1, self._frames(chop_ms))
+        starts = np.asarray(starts, dtype=np.int64)
+
+        # Índices de todas as janelas de uma vez (fora do vocal = silêncio)
+        padded = np.concatenate((self.samples, np.zeros(length, dtype=np.float32)))
+        index = np.minimum(starts[:, None] + np.arange(length), len(padded) - 1)
+        chops = padded[index]
+
+        # Fade ao fim do material real de cada chop (quando o vocal acaba antes)
+        real_length = np.clip(len(self.samples) - starts, 1, length)
+        fade = max(1, self._frames(fade_ms))
+        position = np.arange(length)
+        fade_in = np.minimum(position / fade, 1.0)
+        fade_out = np.clip((real_length[:, None] - position) / fade, 0.0, 1.0)
+
+        return chops * fade_in * fade_out
+
+    def place(self, chops, positions_ms, length_ms=None, gain_db=0):
+        """
+        Mixa os chops nas posições dadas em um único buffer
+
+        Args:
+            chops: Matriz (n_chops, frames) vinda de slice()
+            positions_ms: Posição de cada chop (ms)
+            length_ms: Duração total (padrão: até o fim do último chop)
+            gain_db: Ganho aplicado à mixagem
+        """
+        positions = (np.asarray(positions_ms, dtype=np.float64) * self.frame_rate / 1000).astype(np.int64)
+        n, length = chops.shape
+        if length_ms is None:
+            total = int(positions.max() + length) if n else 0
+        else:
+            total = self._frames(length_ms)
+
+        index = positions[:, None] + np.arange(length)
+        valid = (index >= 0) & (index < total)
+        if not valid.any():
+            return from_float(np.zeros(total), self.frame_rate, scale=1)  # Nenhum chop cai no trecho
+        mix = np.bincount(index[valid], weights=chops[valid], minlength=total).astype(np.float64)
+        mix *= 10 ** (gain_db / 20)
+
+        return from_float(mix, self.frame_rate, scale=1)
+
+    def chop_to_grid(self, tempo, beats, chop_beats=0.5, onsets=False,
+                     fade_ms=10, start_time=0, length_ms=None, gain_db=0):
+        """
+        Posiciona chops no grid de tempo
+
+        Args:
+            tempo: BPM do grid
+            beats: Posições em beats onde cada chop entra
+            chop_beats: Duração de cada chop em beats
+            onsets: Se True, corta nos ataques detectados do vocal
+            fade_ms: Fade in/out de cada chop
+            start_time: Deslocamento do grid (ms)
+            length_ms: Duração total do resultado
+            gain_db: Ganho da mixagem
+        """
+        beat_duration = 60000 / tempo
+        chop_ms = chop_beats * beat_duration
+        beats = np.asarray(beats, dtype=np.float64)
+
+        if onsets:
+            onset_starts = self.detect_onsets()
+            starts = onset_starts[np.arange(len(beats)) % len(onset_starts)]
+        else:
+            starts = self.fixed_starts(chop_ms, len(beats))
+
+        chops = self.slice(starts, chop_ms, fade_ms=fade_ms)
+        positions = start_time + beats * beat_duration
+        return self.place(chops, positions, length_ms=length_ms, gain_db=gain_db)
@@ -5,14 +5,17 @@ Usa TTS e síntese para criar vozes programaticamente
 
 import numpy as np
 from pydub import AudioSegment
-from pydub.generators import Sine
 import gtts
 import os
+from vocal_chop import VocalChopEngine
+from render_quality import get_quality
+from audio_buffer import from_float
 
 
 class VoiceGenerator:
-    def __init__(self):
-        self.sample_rate = 44100
+    def __init__(self, quality=None):
+        self.quality = get_quality(quality)
+        self.sample_rate = self.quality.sample_rate
     
     def text_to_speech(self, text, language='pt-br', filename='voice.mp3'):
         """
@@ -41,9 +44,12 @@ class VoiceGenerator:
             durations: Lista de durações em milissegundos
             output_file: Caminho do arquivo de saída
         """
-        melody = AudioSegment.empty()
+        # Todas as notas em um único buffer (sem concatenar AudioSegments)
+        lengths = [int(self.sample_rate * duration / 1000) for duration in durations]
+        offsets = np.cumsum([0] + lengths)
+        samples = np.zeros(offsets[-1])
         
-        for note, duration in zip(notes, durations):
+        for note, duration, start, length in zip(notes, durations, offsets, lengths):
             # Converter MIDI para Hz se necessário
             if note < 500:  # Assumir que é nota MIDI
                 freq = self.midi_to_hz(note)
@@ -51,15 +57,18 @@ class VoiceGenerator:
                 freq = note
             
             # Gerar tom
-            tone = Sine(freq).to_audio_segment(duration=duration)
+            n = np.arange(length)
+            tone = np.sin(2 * np.pi * freq * n / self.sample_rate)
             
             # Aplicar envelope (attack, decay)
-            attack = min(50, duration // 4)
-            release = min(100, duration // 4)
-            tone = tone.fade_in(attack).fade_out(release)
+            attack = max(1, int(self.sample_rate * min(50, duration // 4) / 1000))
+            release = max(1, int(self.sample_rate * min(100, duration // 4) / 1000))
+            envelope = np.minimum(np.minimum(n / attack, (length - n) / release), 1.0)
             
             # Adicionar à melodia
-            melody += tone
+            samples[start:start + length] = tone * envelope
+        
+        melody = from_float(samples, self.sample_rate)
         
         # Exportar
         melody.export(output_file, format="wav")
@@ -83,27 +92,17 @@ class VoiceGenerator:
         voice = AudioSegment.from_mp3(temp_file)
         
         # Normalizar volume
-        voice = voice.normalize()
+        voice = voice.normalize().set_frame_rate(self.sample_rate)
         
-        # Criar chops
-        chopped = AudioSegment.empty()
+        # Criar chops (todos de uma vez, em um único buffer)
+        engine = VocalChopEngine(voice)
         chop_size = min(chop_duration, len(voice))
+        gap = 50  # Silêncio entre chops (ms)
         
-        for i in range(repetitions):
-            # Extrair pedaço
-            start = (i * chop_size) % len(voice)
-            end = start + chop_size
-            
-            if end > len(voice):
-                end = len(voice)
-            
-            chop = voice[start:end]
-            
-            # Adicionar efeitos
-            chop = chop.fade_in(10).fade_out(10)
-            
-            # Adicionar silêncio entre chops
-            chopped += chop + AudioSegment.silent(duration=50)
+        starts = engine.fixed_starts(chop_size, repetitions)
+        chops = engine.slice(starts, chop_size, fade_ms=10)
+        positions = np.arange(repetitions) * (chop_size + gap)
+        chopped = engine.place(chops, positions, length_ms=repetitions * (chop_size + gap))
         
         # Limpar arquivo temporário
         if os.path.exists(temp_file):